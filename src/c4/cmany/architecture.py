@@ -1,5 +1,3 @@
-import re
-
 from .build_item import BuildItem
 from . import util
 
@@ -19,17 +17,16 @@ class Architecture(BuildItem):
         # if s == "amd64":
         #     s = "x86_64"
         # return s
-        if util.in_64bit():
-            return "x86_64"
-        elif util.in_32bit():
-            return "x86"
+        def fn():
+            if util.in_64bit():
+                return "x86_64"
+            elif util.in_32bit():
+                return "x86"
+        return util.cacheattr(__class__, '_default_str', fn)
 
     @property
     def is64(self):
-        def fn():
-            s = re.search('64', self.name)
-            return s is not None
-        return util.cacheattr(self, "_is64", fn)
+        return '64' in self.name
 
     @property
     def is32(self):
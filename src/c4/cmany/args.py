@@ -167,6 +167,14 @@ def add_basic(parser):
     parser.add_argument("-j", "--jobs", default=cpu_count(),
                         help="""use the given number of parallel jobs
                         (defaults to %(default)s on this machine).""")
+    parser.add_argument("--outer-jobs", default=None, type=int,
+                        help="""process up to this number of builds at the
+                        same time, each in a separate process, splitting the
+                        jobs given with -j among them. The output of each
+                        build is shown once it finishes. Defaults to the
+                        number of cpus ({}) when configuring (unless --deps
+                        is given with a --deps-prefix), and to 1
+                        otherwise.""".format(cpu_count()))
     parser.add_argument("--continue", default=False, action="store_true",
                         help="attempt to continue when a build fails")
 
@@ -191,6 +199,24 @@ def add_proj(parser):
                         help="""Have cmake export a compile_commands.json
                         containing the compile commands for each file. This
                         is useful e.g. for clang-based indexing tools.""")
+    parser.add_argument("--force-configure", default=False,
+                        action="store_true",
+                        help="""Run cmake to configure the builds even when
+                        neither the cmake command line nor the preload file
+                        changed since they were last configured.""")
+    parser.add_argument("--no-launcher", default=False,
+                        action="store_true",
+                        help="""Do not use a compiler cache (sccache or
+                        ccache) as the compiler launcher, even when one is
+                        found in the PATH.""")
+    parser.add_argument("-G", "--generator", default=None, type=str,
+                        help="""Use this cmake generator for the builds not
+                        using a Visual Studio compiler. Existing build trees
+                        keep the generator they were configured with, unless
+                        this is given; in that case, their cmake cache is
+                        removed. Fresh build trees get Ninja when it is found
+                        in the PATH, and cmake's default generator
+                        otherwise.""")
     #
     g = parser.add_argument_group('Configuration files')
     g.add_argument("--config-file", default=[], action="append",
@@ -1,9 +1,8 @@
 import os
 import copy
 import re
-import dill
+import shutil
 import subprocess
-from datetime import datetime
 from collections import OrderedDict as odict
 
 from .generator import Generator
@@ -20,23 +19,137 @@ from .util import logdbg as dbg
 from .conan import Conan
 
 
+# the build dirs created so far by this process. This is kept out of the
+# Build objects, as these are serialized and may be used by other processes.
+_created_dirs = set()
+
+# the cmany_deps.done marks found so far by this process
+_seen_deps_marks = set()
+
+# the build roots where this process already wrote the common preload file
+_common_pfile_roots = set()
+
+# the compilers named in toolchain files, probed only once per process
+# for all the builds which use the same toolchain
+_toolchain_compilers = {}
+
+
+def _toolchain_compiler(toolchain_file):
+    c = _toolchain_compilers.get(toolchain_file)
+    if c is None:
+        comps = cmake.extract_toolchain_compilers(toolchain_file)
+        c = Compiler(comps['CMAKE_CXX_COMPILER'])
+        _toolchain_compilers[toolchain_file] = c
+    # builds may change their compiler, so don't share it
+    return copy.deepcopy(c)
+
+
+# the date written to the preload files. It is the same for all
+# the builds handled by this process, so get it only once
+_preload_date_str = None
+
+
+def _preload_date():
+    global _preload_date_str
+    if _preload_date_str is None:
+        from datetime import datetime
+        _preload_date_str = datetime.now().strftime("%Y/%m/%d %H:%M")
+    return _preload_date_str
+
+
+def _write_if_changed(filename, txt, ignore_prefix=None):
+    """do not touch the file if its contents are the same, so that its
+    modification time is preserved. Lines starting with ignore_prefix
+    (eg, a date) do not count as changes."""
+    try:
+        with open(filename, "r") as f:
+            old = f.read()
+    except FileNotFoundError:
+        old = None
+    if old == txt:
+        return
+    if old is not None and ignore_prefix is not None:
+        def relevant(t):
+            return [l for l in t.splitlines() if not l.startswith(ignore_prefix)]
+        if relevant(old) == relevant(txt):
+            return
+    # write to a temporary file first: other cmany processes
+    # may be reading the file
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmp = "{}.{}.tmp".format(filename, os.getpid())
+    with open(tmp, "w") as f:
+        f.write(txt)
+    os.replace(tmp, filename)
+
+
+_make_help_default_rx = re.compile(r'(.*)\ \(the default if no target.*\)')
+
+
+def _vcxproj_names(builddir):
+    """get the names of the vcxproj files in the build tree. cmake's own
+    dirs are skipped, as their projects are not targets of the build"""
+    names = []
+    todo = [builddir]
+    while todo:
+        with os.scandir(todo.pop()) as it:
+            for e in it:
+                if e.is_dir():
+                    if e.name != 'CMakeFiles':
+                        todo.append(e.path)
+                elif e.name.endswith('.vcxproj'):
+                    names.append(e.name[:-len('.vcxproj')])
+    return names
+
+
+def _ninja_target_names(output):
+    """get the target names from the output of `ninja -t targets all`,
+    whose lines look like `name: rule`. Only the phony targets (which
+    cmake adds for the libraries and the utilities) and the executables
+    are named like make would; the other names are files."""
+    names = []
+    for l in output.splitlines():
+        name, sep, rule = l.rpartition(': ')
+        if not sep or name.startswith(('/', 'CMakeFiles/', 'cmake_object_order_depends_target_')):
+            continue
+        if rule == 'phony' and name != 'CMakeCache.txt':
+            names.append(name)
+        elif rule in ('CLEAN', 'HELP'):
+            names.append(name)
+        elif 'EXECUTABLE_LINKER' in rule and '/' not in name:
+            names.append(name)
+    return names
+
+
+def _compiler_launcher():
+    """a compiler cache program found in the PATH, or None"""
+    return util.which('sccache') or util.which('ccache')
+
+
 # -----------------------------------------------------------------------------
 class Build(NamedItem):
     """Holds a build's settings"""
 
     pfile = "cmany_preload.cmake"
+    common_pfile = ".cmany_preload_common.cmake"  # in the build root
     sfile = "cmany_build.dill"
 
     def __init__(self, proj_root, build_root, install_root,
                  system, arch, build_type, compiler, variant, flags,
-                 num_jobs, kwargs):
+                 num_jobs, kwargs, check_paths=True):
         #
         self.kwargs = kwargs
         self.export_compile = self.kwargs.get('export_compile', True)
         #
-        self.projdir = util.chkf(proj_root)
-        self.buildroot = util.abspath(build_root)
-        self.installroot = util.abspath(install_root)
+        # check_paths=False when the caller already checked that the
+        # project dir exists, and made the roots absolute
+        if check_paths:
+            self.projdir = util.chkf(proj_root)
+            self.buildroot = util.abspath(build_root)
+            self.installroot = util.abspath(install_root)
+        else:
+            self.projdir = proj_root
+            self.buildroot = build_root
+            self.installroot = install_root
         #
         self.flags = flags
         self.system = system
@@ -47,11 +160,11 @@ class Build(NamedItem):
         #
         self.adjusted = False
         #
-        if util.in_64bit and self.architecture.is32:
+        if util.in_64bit() and self.architecture.is32:
             if self.compiler.gcclike:
                 dbg("making 32 bit")
                 self.compiler.make_32bit()
-        elif util.in_32bit and self.architecture.is64:
+        elif util.in_32bit() and self.architecture.is64:
             if self.compiler.gcclike:
                 dbg("making 64 bit")
                 self.compiler.make_64bit()
@@ -61,9 +174,7 @@ class Build(NamedItem):
         #
         self.toolchain_file = self._get_toolchain()
         if self.toolchain_file:
-            comps = cmake.extract_toolchain_compilers(self.toolchain_file)
-            c = Compiler(comps['CMAKE_CXX_COMPILER'])
-            self.adjust(compiler=c)
+            self.adjust(compiler=_toolchain_compiler(self.toolchain_file))
         #
         # WATCHOUT: this may trigger a readjustment of this build's parameters
         self.generator = self.create_generator(num_jobs)
@@ -91,14 +202,32 @@ class Build(NamedItem):
             self.compiler, self.build_type, self.variant, '-')
         self.buildtag = self.tag
         self.installtag = self.tag  # this was different in the past and may become so in the future
-        self.builddir = os.path.join(self.buildroot, self.buildtag)
+        self._set_builddir(os.path.join(self.buildroot, self.buildtag))
         self.installdir = os.path.join(self.installroot, self.installtag)
         self.preload_file = os.path.join(self.builddir, Build.pfile)
-        self.cachefile = os.path.join(self.builddir, 'CMakeCache.txt')
-        for prop in "projdir buildroot installroot buildtag installtag builddir installdir preload_file cachefile".split(" "):
-            dbg("    {}: {}={}".format(self.tag, prop, getattr(self, prop)))
+        if util._debug_mode:  # don't format the messages if they're not shown
+            for prop in "projdir buildroot installroot buildtag installtag builddir installdir preload_file cachefile".split(" "):
+                dbg("    {}: {}={}".format(self.tag, prop, getattr(self, prop)))
         return self.tag
 
+    def _set_builddir(self, builddir):
+        self.builddir = builddir
+        self.cachefile = os.path.join(builddir, 'CMakeCache.txt')
+
+    # these are derived from the builddir when needed, as they are
+    # missing from the builds serialized by older versions
+    @property
+    def configure_mark(self):
+        return os.path.join(self.builddir, 'cmany_configure.done')
+
+    @property
+    def build_mark(self):
+        return os.path.join(self.builddir, 'cmany_build.done')
+
+    @property
+    def deps_mark(self):
+        return os.path.join(self.builddir, 'cmany_deps.done')
+
     def create_generator(self, num_jobs, fallback_generator="Unix Makefiles"):
         """create a generator, adjusting the build parameters if necessary"""
         #if self.toolchain_file is not None:
@@ -106,17 +235,35 @@ class Build(NamedItem):
         #    print(toolchain_cache)
         #    self.adjust(compiler=toolchain_cache['CMAKE_CXX_COMPILER'])
         if self.compiler.is_msvc:
-            vsi = vsinfo.VisualStudioInfo(self.compiler.name)
+            # the compiler already carries the info for its name
+            vsi = getattr(self.compiler, 'vs', None)
+            if vsi is None:
+                vsi = vsinfo.VisualStudioInfo(self.compiler.name)
             g = Generator(vsi.gen, self, num_jobs)
             arch = Architecture(vsi.architecture)
             self.adjust(architecture=arch)
             self.vsinfo = vsi
             return g
         else:
-            if self.system.name == "windows":
-                return Generator(fallback_generator, self, num_jobs)
-            else:
-                return Generator(Generator.default_str(), self, num_jobs)
+            # if this differs from the generator of an existing build
+            # tree, configure() starts it over with this one
+            g = self.kwargs.get('generator')
+            if not g and cmake.hascache(self.builddir):
+                # do not throw away an existing tree only because
+                # eg, ninja was installed after it was configured
+                g = cmake.getcachevars(self.builddir, ['CMAKE_GENERATOR']).get('CMAKE_GENERATOR')
+            if not g:
+                g = __class__.default_generator(self.system, fallback_generator)
+            return Generator(g, self, num_jobs)
+
+    @staticmethod
+    def default_generator(system, fallback_generator="Unix Makefiles"):
+        """the name of the generator for the builds not using msvc"""
+        if system.name == "windows":
+            g = fallback_generator
+        else:
+            g = Generator.default_str()
+        return Generator.preferred(g)
 
     def adjust(self, **kwargs):
         for k, _ in kwargs.items():
@@ -140,25 +287,28 @@ class Build(NamedItem):
         # some utilities (eg, ar) dont deal well with + in the path
         # so replace + with x
         # eg see https://sourceforge.net/p/mingw/bugs/1429/
-        sc = __class__.sanitize_compiler_name(c)
-        s = str(s) + sep + str(a) + sep + sc + sep + str(t)
+        parts = [str(s), str(a), __class__.sanitize_compiler_name(c), str(t)]
         if v is not None and isinstance(v, Variant):
             v = v.name
         if v and v != "none":
-            s += "{sep}{var}".format(sep=sep, var=str(v))
-        return s
+            parts.append(str(v))
+        return sep.join(parts)
 
     @staticmethod
     def sanitize_compiler_name(c):
-        sc = re.sub(r'\+', 'x', str(c))
+        sc = str(c).replace('+', 'x')
         return sc
 
     def create_dir(self):
-        if not os.path.exists(self.builddir):
-            os.makedirs(self.builddir)
+        # this is called several times for each build, so remember the
+        # dirs which were already created by this process
+        if self.builddir not in _created_dirs:
+            os.makedirs(self.builddir, exist_ok=True)
+            _created_dirs.add(self.builddir)
 
     def _serialize(self):
         # https://stackoverflow.com/questions/4529815/saving-an-object-data-persistence
+        import dill  # import only when needed, as it is expensive
         protocol = 0  # serialize in ASCII
         fn = os.path.join(self.builddir, __class__.sfile)
         with open(fn, 'wb') as f:
@@ -172,6 +322,7 @@ class Build(NamedItem):
         fn = os.path.join(builddir, __class__.sfile)
         if not os.path.exists(fn):
             raise err.BuildSerializationNotFound(fn, builddir)
+        import dill  # import only when needed, as it is expensive
         with open(fn, 'rb') as f:
             return dill.load(f)
 
@@ -190,19 +341,44 @@ class Build(NamedItem):
         self.create_dir()
         self.create_preload_file()
         self.handle_deps()
-        if self.needs_cache_regeneration():
+        self._remove_cache_if_generator_changed()
+        regen = self.needs_cache_regeneration()
+        if regen:
             self.varcache.commit(self.builddir)
+        cmd = self.configure_cmd()
+        digest = self._configure_digest(cmd)
+        if (not regen and not self.kwargs.get('force_configure')
+                and self._configure_is_current(digest)):
+            util.loginfo("nothing changed since the last configure: skipping",
+                         "(use --force-configure to configure anyway)")
+            return
         with util.setcwd(self.builddir, silent=False):
-            cmd = self.configure_cmd()
             try:
                 util.runsyscmd(cmd)
-                self.mark_configure_done(cmd)
+                self.mark_configure_done(cmd, digest)
             except Exception as e:
                 raise err.ConfigureFailed(self, cmd, e)
         if self.export_compile:
             if not self.generator.exports_compile_commands:
                 util.logwarn("WARNING: this generator cannot export compile commands. Use 'cmany export_compile_commands/xcc to export the compile commands.'")
 
+    def _remove_cache_if_generator_changed(self):
+        """cmake refuses to configure a build tree with a generator other
+        than the one it was first configured with, so start over"""
+        v = self.varcache.get('CMAKE_GENERATOR')
+        if v is None or v.val == self.generator.name:
+            return
+        if not os.path.exists(self.cachefile):
+            return
+        util.logwarn("{}: generator changed from '{}' to '{}': removing the cmake cache".format(
+            self.tag, v.val, self.generator.name))
+        os.remove(self.cachefile)
+        shutil.rmtree(os.path.join(self.builddir, 'CMakeFiles'), ignore_errors=True)
+        # the build done with the previous generator is gone as well
+        if os.path.exists(self.build_mark):
+            os.remove(self.build_mark)
+        v.val = self.generator.name
+
     def export_compile_commands(self):
         # some generators (notably VS/msbuild) cannot export compile
         # commands, so to get that, we'll configure a second build using the
@@ -211,8 +387,7 @@ class Build(NamedItem):
         if self.needs_configure():
             self.configure()
         trickdir = os.path.join(self.builddir, '.export_compile_commands')
-        if not os.path.exists(trickdir):
-            os.makedirs(trickdir)
+        os.makedirs(trickdir, exist_ok=True)
         with util.setcwd(trickdir, silent=False):
             cmd = ['cmake', '-G', 'Ninja', '-DCMAKE_EXPORT_COMPILE_COMMANDS=ON', '-C', self.preload_file, self.projdir]
             try:
@@ -256,24 +431,49 @@ class Build(NamedItem):
         if not os.path.exists(pkf):
             raise err.BuildSerializationNotFound(pkf, self.builddir)
 
-    def mark_configure_done(self, cmd):
+    def _configure_digest(self, cmd):
+        """get a digest of the inputs to the configure step: the cmake
+        command line, the compiler and the preload file, without its date"""
+        import hashlib
+        h = hashlib.blake2b(digest_size=20)
+        h.update("\0".join(cmd).encode())
+        h.update(b"\0")
+        h.update(self.compiler.path.encode())
+        h.update(b"\0")
+        h.update(self._preload_txt(date="").encode())
+        return h.hexdigest()
+
+    def _current_configure_digest(self):
+        return self._configure_digest(self.configure_cmd())
+
+    def _configure_is_current(self, digest):
+        """was this build configured with the inputs of this digest?"""
+        if not os.path.exists(self.cachefile):
+            return False
+        try:
+            with open(self.configure_mark) as f:
+                return digest in f.read().split()
+        except FileNotFoundError:
+            return False
+
+    def mark_configure_done(self, cmd, digest=None):
         self._serialize()
-        with util.setcwd(self.builddir):
-            with open("cmany_configure.done", "w") as f:
-                f.write(" ".join(cmd) + "\n")
+        if digest is None:
+            digest = self._configure_digest(cmd)
+        with open(self.configure_mark, "w") as f:
+            f.write(" ".join(cmd) + "\n" + digest + "\n")
 
     def needs_configure(self):
         if not os.path.exists(self.builddir):
             return True
-        with util.setcwd(self.builddir):
-            if not os.path.exists("cmany_configure.done"):
-                return True
-            if self.needs_cache_regeneration():
-                return True
-        return False
+        if self.needs_cache_regeneration():
+            return True
+        return not self._configure_is_current(self._current_configure_digest())
 
     def needs_cache_regeneration(self):
-        if os.path.exists(self.cachefile) and self.varcache.dirty:
+        # test the (in-memory) dirty flag first; usually it's not set,
+        # and then the cache file need not be looked for
+        if self.varcache.dirty and os.path.exists(self.cachefile):
             return True
         return False
 
@@ -288,11 +488,8 @@ class Build(NamedItem):
                     targets = ["ALL_BUILD"]
                 else:
                     targets = ["all"]
-            # cmake --build and visual studio won't handle
-            # multiple targets at once, so loop over them.
-            for t in targets:
+            for cmd in self._build_cmds(targets):
                 try:
-                    cmd = self.generator.cmd([t])
                     util.runsyscmd(cmd)
                 except Exception as e:
                     raise err.CompileFailed(self, cmd, e)
@@ -308,29 +505,42 @@ class Build(NamedItem):
                     targets = ["ALL_BUILD"]
                 else:
                     targets = ["all"]
-            # cmake --build and visual studio won't handle
-            # multiple targets at once, so loop over them.
-            for t in targets:
-                cmd = self.generator.cmd([t])
+            for cmd in self._build_cmds(targets):
                 try:
                     util.runsyscmd(cmd)
                 except Exception as e:
                     raise err.CompileFailed(self, cmd, e)
 
+    def _build_cmds(self, targets):
+        """get the commands to build the targets. Use a single command
+        when the generator can build all the targets at once, so that it
+        can schedule them together"""
+        # visual studio won't handle multiple targets at once,
+        # so loop over them.
+        if len(targets) > 1 and not self.generator.is_msvc:
+            try:
+                return [self.generator.cmd(targets)]
+            except err.TooManyTargets:  # cmake is too old
+                pass
+        return [self.generator.cmd([t]) for t in targets]
+
     def mark_build_done(self, cmd):
-        with util.setcwd(self.builddir):
-            with open("cmany_build.done", "w") as f:
-                f.write(" ".join(cmd) + "\n")
+        # the configure digest tells which configuration was built
+        digest = self._current_configure_digest()
+        with open(self.build_mark, "w") as f:
+            f.write(" ".join(cmd) + "\n" + digest + "\n")
 
     def needs_build(self):
         if not os.path.exists(self.builddir):
             return True
-        with util.setcwd(self.builddir):
-            if not os.path.exists("cmany_build.done"):
-                return True
-            if self.needs_cache_regeneration():
-                return True
-        return False
+        if self.needs_cache_regeneration():
+            return True
+        try:
+            with open(self.build_mark) as f:
+                done = f.read().split()
+        except FileNotFoundError:
+            return True
+        return self._current_configure_digest() not in done
 
     def install(self):
         self.create_dir()
@@ -356,10 +566,10 @@ class Build(NamedItem):
 
     def clean(self):
         self.create_dir()
-        with util.setcwd(self.builddir):
-            cmd = self.generator.cmd(['clean'])
-            util.runsyscmd(cmd)
-            os.remove("cmany_build.done")
+        cmd = self.generator.cmd(['clean'])
+        util.runsyscmd(cmd, cwd=self.builddir)
+        if os.path.exists(self.build_mark):
+            os.remove(self.build_mark)
 
     def _get_flagseq(self):
         return (
@@ -387,23 +597,17 @@ class Build(NamedItem):
     def _gather_flags(self, which, append_to_sysinfo_var=None, with_defines=False):
         flags = []
         if append_to_sysinfo_var:
-            try:
-                flags = [cmake.CMakeSysInfo.var(append_to_sysinfo_var, self.generator)]
-            except RuntimeError:
-                pass
-        # append overall build flags
-        # append variant flags
-        flagseq = self._get_flagseq()
-        for fs in flagseq:
-            wf = getattr(fs, which)
-            for f in wf:
-                if isinstance(f, str):
-                    r = f
-                elif isinstance(f, CFlag):
-                    r = f.get(self.compiler)
-                flags.append(r)
+            v = cmake.CMakeSysInfo.try_var(append_to_sysinfo_var, self.generator)
+            if v is not None:
+                flags.append(v)
+        # append the flags of the build, then those of each build item;
+        # flags not yet resolved to a string are resolved for the compiler
+        compiler = self.compiler
+        for fs in self._get_flagseq():
+            flags.extend(f if isinstance(f, str) else f.get(compiler)
+                         for f in getattr(fs, which))
             if with_defines:
-                flags += fs.defines
+                flags.extend(fs.defines)
         # we're done
         return flags
 
@@ -429,6 +633,16 @@ class Build(NamedItem):
         if (not self.generator.is_msvc) and (not self.toolchain_file):
             _set(vc.f, 'CMAKE_C_COMPILER', self.compiler.c_compiler)
             _set(vc.f, 'CMAKE_CXX_COMPILER', self.compiler.path)
+        # builds sharing sources will hit the compiler cache. Only the
+        # makefile and ninja generators honor the launcher vars.
+        if ((self.generator.is_makefile or self.generator.is_ninja)
+                and not self.kwargs.get('no_launcher')):
+            launcher = _compiler_launcher()
+            if launcher is not None:
+                for var in ('CMAKE_C_COMPILER_LAUNCHER', 'CMAKE_CXX_COMPILER_LAUNCHER'):
+                    v = vc.get(var)
+                    if v is None or not v.from_input:  # don't override the user's choice
+                        _set(vc.f, var, launcher)
         _set(vc.s, 'CMAKE_BUILD_TYPE', str(self.build_type))
         _set(vc.p, 'CMAKE_INSTALL_PREFIX', self.installdir)
         #
@@ -447,39 +661,54 @@ class Build(NamedItem):
         #     _set(vc.s, 'CMAKE_LINK_DIRECTORIES', ';'.join(self.flags.link_dirs))
         #
 
-    def create_preload_file(self):
-        # http://stackoverflow.com/questions/17597673/cmake-preload-script-for-cache
-        self.create_dir()
+    def _preload_txt(self, date):
         lines = []
         s = '_cmany_set({} "{}" {})'
-        for _, v in self.varcache.items():
+        # sort the vars: the cache order differs from the input
+        # order, and the text must not change once the cache exists
+        for v in sorted(self.varcache.values(), key=lambda v: v.name):
             if v.from_input:
                 lines.append(s.format(v.name, v.val, v.vartype))
-        if lines:
-            tpl = _preload_file_tpl
-        else:
-            tpl = _preload_file_tpl_empty
-        now = datetime.now().strftime("%Y/%m/%d %H:%m")
-        txt = tpl.format(date=now, vars="\n".join(lines))
-        with open(self.preload_file, "w") as f:
-            f.write(txt)
+        if not lines:
+            return _preload_file_tpl_empty.format(date=date)
+        # relative to the preload file, so that the text is the same
+        # wherever the build root is
+        common = os.path.relpath(os.path.join(self.buildroot, Build.common_pfile),
+                                 os.path.dirname(self.preload_file))
+        return _preload_file_tpl.format(date=date, vars="\n".join(lines),
+                                        common=common.replace('\\', '/'))
+
+    def create_preload_file(self):
+        # http://stackoverflow.com/questions/17597673/cmake-preload-script-for-cache
+        self.create_dir()
+        txt = self._preload_txt(_preload_date())
+        # the preamble shared by all the builds in the build root
+        if self.buildroot not in _common_pfile_roots:
+            _write_if_changed(os.path.join(self.buildroot, Build.common_pfile),
+                              _preload_file_common_tpl)
+            _common_pfile_roots.add(self.buildroot)
+        _write_if_changed(self.preload_file, txt, ignore_prefix=_preload_date_prefix)
         return self.preload_file
 
     @property
     def deps_done(self):
-        dmark = os.path.join(self.builddir, "cmany_deps.done")
-        exists = os.path.exists(dmark)
-        return exists
+        # handle_deps() is called on every configure and build,
+        # so remember the marks which were already seen
+        if self.deps_mark in _seen_deps_marks:
+            return True
+        if os.path.exists(self.deps_mark):
+            _seen_deps_marks.add(self.deps_mark)
+            return True
+        return False
 
     def mark_deps_done(self):
-        with util.setcwd(self.builddir):
-            with open("cmany_deps.done", "w") as f:
-                s = ''
-                if self.deps:
-                    s += self.deps + '\n'
-                if self.deps_prefix:
-                    s += self.deps_prefix + '\n'
-                f.write(s)
+        with open(self.deps_mark, "w") as f:
+            s = ''
+            if self.deps:
+                s += self.deps + '\n'
+            if self.deps_prefix:
+                s += self.deps_prefix + '\n'
+            f.write(s)
 
     def handle_deps(self):
         if self.deps_done:
@@ -489,26 +718,40 @@ class Build(NamedItem):
             self.mark_deps_done()
             return
         util.lognotice(self.tag + ': building dependencies', self.deps)
-        dup = copy.copy(self)
-        dup.builddir = os.path.join(self.builddir, 'cmany_deps-build')
-        dup.installdir = self.deps_prefix
+        dup = self._deps_build()
         util.logwarn('installdir:', dup.installdir)
-        dup.projdir = self.deps
-        dup.preload_file = os.path.join(self.builddir, self.preload_file)
-        dup.deps = None
-        dup.generator.build = dup
         dup.configure()
         dup.build()
         try:
             # if the dependencies cmake project is purely consisted of
             # external projects, there won't be an install target.
             dup.install()
-        except Exception as e:
+        except err.InstallFailed:
             util.logwarn(self.name + ": could not install. Maybe there's no install target?")
         util.logdone(self.name + ': finished building dependencies. Install dir=', self.installdir)
         self.varcache.p('CMAKE_PREFIX_PATH', self.installdir)
         self.mark_deps_done()
 
+    def _deps_build(self):
+        """get a build for the dependencies project. It uses the settings
+        and the preload file of this build, but it needs its own generator
+        and cache vars: these are tied to the build they belong to."""
+        dup = copy.copy(self)
+        dup._set_builddir(os.path.join(self.builddir, 'cmany_deps-build'))
+        dup.installdir = self.deps_prefix
+        dup.projdir = self.deps
+        dup.deps = None
+        dup.generator = copy.copy(self.generator)
+        dup.generator.build = dup
+        # the deps have their own cache, which gets only the vars given
+        # as input. Committing these to the deps cache must not mark
+        # them as committed for this build.
+        dup.varcache = cmake.CMakeCache(dup.builddir)
+        for v in self.varcache.values():
+            if v.from_input:
+                dup.varcache.setvar(v.name, v.val, v.vartype, from_input=True)
+        return dup
+
     def handle_conan(self):
         if not self.kwargs.get('with_conan'):
             return
@@ -532,7 +775,7 @@ class Build(NamedItem):
         https://blogs.msdn.microsoft.com/vcblog/2016/12/20/cmake-support-in-visual-studio-2017-whats-new-in-the-rc-update/
         """
         builddir = self.builddir.replace(self.projdir, '${projectDir}')
-        builddir = re.sub(r'\\', r'/', builddir)
+        builddir = builddir.replace('\\', '/')
         return odict([
             ('name', self.tag),
             ('generator', self.generator.name),
@@ -543,29 +786,31 @@ class Build(NamedItem):
         ])
 
     def get_targets(self):
-        with util.setcwd(self.builddir):
-            if self.generator.is_msvc:
-                # each target in MSVC has a corresponding vcxproj file
-                files = list(util.find_files_with_ext(self.builddir, ".vcxproj"))
-                files = [os.path.basename(f) for f in files]
-                files = [os.path.splitext(f)[0] for f in files]
-                return files
-            elif self.generator.is_makefile:
-                output = util.runsyscmd(["make", "help"], echo_cmd=False,
-                                        echo_output=False, capture_output=True)
-                output = output.split("\n")
-                output = output[1:]  # The following are some of the valid targets....
-                output = [o[4:] for o in output]  # take off the initial "... "
-                output = [re.sub(r'(.*)\ \(the default if no target.*\)', r'\1', o) for o in output]
-                output = sorted(output)
-                result = []
-                for o in output:
-                    if o:
-                        result.append(o)
-                return result
-            else:
-                util.logerr("sorry, feature not implemented for this generator: " +
-                            str(self.generator))
+        if self.generator.is_msvc:
+            # each target in MSVC has a corresponding vcxproj file
+            return _vcxproj_names(self.builddir)
+        elif self.generator.is_makefile:
+            output = util.runsyscmd(["make", "help"], echo_cmd=False,
+                                    echo_output=False, capture_output=True,
+                                    cwd=self.builddir)
+            output = output.split("\n")
+            output = output[1:]  # The following are some of the valid targets....
+            output = [o[4:] for o in output]  # take off the initial "... "
+            output = [_make_help_default_rx.sub(r'\1', o) for o in output]
+            output = sorted(output)
+            result = []
+            for o in output:
+                if o:
+                    result.append(o)
+            return result
+        elif self.generator.is_ninja:
+            output = util.runsyscmd(["ninja", "-t", "targets", "all"], echo_cmd=False,
+                                    echo_output=False, capture_output=True,
+                                    cwd=self.builddir)
+            return sorted(_ninja_target_names(output))
+        else:
+            util.logerr("sorry, feature not implemented for this generator: " +
+                        str(self.generator))
 
     def show_properties(self):
         util.logcmd(self.name)
@@ -589,13 +834,7 @@ _preload_file_tpl = ("""\
 # Do not edit. Will be overwritten.
 # Generated by cmany on {date}
 
-if(NOT _cmany_set_def)
-    set(_cmany_set_def ON)
-    function(_cmany_set var value type)
-        set(${{var}} "${{value}}" CACHE ${{type}} "")
-        message(STATUS "cmany: ${{var}}=${{value}}")
-    endfunction(_cmany_set)
-endif(NOT _cmany_set_def)
+include("${{CMAKE_CURRENT_LIST_DIR}}/{common}")
 
 message(STATUS "cmany:preload----------------------")
 {vars}
@@ -613,6 +852,22 @@ message(STATUS "cmany:preload----------------------")
 # Generated by cmany on {date}
 """)
 
+_preload_date_prefix = "# Generated by cmany on "
+
+# -----------------------------------------------------------------------------
+_preload_file_common_tpl = ("""\
+# Do not edit. Will be overwritten.
+# Generated by cmany. Included by the preload file of each build.
+
+if(NOT _cmany_set_def)
+    set(_cmany_set_def ON)
+    function(_cmany_set var value type)
+        set(${var} "${value}" CACHE ${type} "")
+        message(STATUS "cmany: ${var}=${value}")
+    endfunction(_cmany_set)
+endif(NOT _cmany_set_def)
+""")
+
 # -----------------------------------------------------------------------------
 _preload_file_tpl_empty = ("""\
 # Do not edit. Will be overwritten.
@@ -10,6 +10,12 @@ from .combination_rules import CombinationRules
 
 # some of parsing functions below are difficult; this is a debugging scaffold
 _dbg_parse = False
+
+# used to convert the class names to snake case in add_build_item()
+_snake_rx1 = re.compile('(.)([A-Z][a-z]+)')
+_snake_rx2 = re.compile('([a-z0-9])([A-Z])')
+
+
 def _dbg(fmt, *args):
     if not _dbg_parse: return
     print(fmt.format(*args))
@@ -248,8 +254,8 @@ class BuildItemCollection(odict):
         # http://stackoverflow.com/questions/1175208/elegant-python-function-to-convert-camelcase-to-snake-case
         cls = item.__class__
         cls_name = cls.__name__
-        cls_name = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', cls_name)
-        cls_name = re.sub('([a-z0-9])([A-Z])', r'\1_\2', cls_name)
+        cls_name = _snake_rx1.sub(r'\1_\2', cls_name)
+        cls_name = _snake_rx2.sub(r'\1_\2', cls_name)
         cls_name = cls_name.lower() + 's'
         # add the item to the list of the class name
         if not self.get(cls_name):
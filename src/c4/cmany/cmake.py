@@ -1,14 +1,30 @@
 import re
 import os
 
-from collections import OrderedDict as odict
-
 from .conf import USER_DIR
 from .util import cacheattr, setcwd, runsyscmd, logdbg
 from . import util
 from . import err
 
 _cache_entry = r'^(.*?)(:.*?)=(.*)$'
+_cache_entry_rx = re.compile(_cache_entry)
+_genid_rx = re.compile(r'[() ]')
+_toolchain_compiler_rx = re.compile(r'(set|SET)\ ?\(\ ?(CMAKE_.*?_COMPILER) (.*?)\ ?\)')
+
+
+def _cache_value(value):
+    """cmake quotes the values with trailing whitespace"""
+    if len(value) >= 2 and value[0] == "'" and value[-1] == "'":
+        return value[1:-1]
+    return value
+
+
+def _cache_quoted(value):
+    """quote the value as cmake does, so that the trailing whitespace
+    is kept"""
+    if value.endswith((' ', '\t')):
+        return "'" + value + "'"
+    return value
 
 
 def hascache(builddir):
@@ -19,7 +35,7 @@ def hascache(builddir):
 
 
 def setcachevar(builddir, var, value):
-    setcachevars(builddir, odict([(var, value)]))
+    setcachevars(builddir, {var: value})
 
 
 def getcachevar(builddir, var):
@@ -28,38 +44,73 @@ def getcachevar(builddir, var):
 
 
 def setcachevars(builddir, varvalues):
-    with setcwd(builddir, silent=True):
-        with open('CMakeCache.txt', 'r') as f:
-            ilines = f.readlines()
-            olines = []
-        for l in ilines:
-            for k, v in varvalues.items():
-                if l.startswith(k + ':'):
-                    n = re.sub(_cache_entry, r'\1\2=' + v, l)
-                    l = n
-            olines.append(l)
-        with open('CMakeCache.txt', 'w') as f:
-            f.writelines(olines)
+    cf = CMakeCacheFile(builddir)
+    cf.apply(varvalues)
+    cf.flush()
+
+
+class CMakeCacheFile:
+    """the lines of a cache file, read in a single pass. The values can
+    then be changed in memory, and the file is written only on flush()"""
+
+    def __init__(self, builddir):
+        self.filename = os.path.join(builddir, 'CMakeCache.txt')
+        self.lines = []
+        self.index = {}
+        self.changed = False
+        with open(self.filename, 'r') as f:
+            for i, l in enumerate(f):
+                self.lines.append(l)
+                name, sep, _ = l.partition(':')
+                if sep and not l.startswith(('#', '//')):
+                    self.index[name] = i
+
+    def apply(self, varvalues):
+        """replace the values of the given vars. Vars which are not in
+        the file are ignored."""
+        for name, val in varvalues.items():
+            i = self.index.get(name)
+            if i is None:
+                continue
+            l = self.lines[i]
+            m = _cache_entry_rx.match(l)
+            if m is None:
+                continue
+            l = "{}{}={}\n".format(m.group(1), m.group(2), _cache_quoted(val))
+            if l != self.lines[i]:
+                self.lines[i] = l
+                self.changed = True
+        return self.changed
+
+    def flush(self):
+        if not self.changed:
+            return False
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'w') as f:
+            f.writelines(self.lines)
+        os.replace(tmp, self.filename)
+        self.changed = False
+        return True
 
 
 def getcachevars(builddir, varlist):
     vlist = [v + ':' for v in varlist]
-    values = odict()
+    values = {}
     with setcwd(builddir, silent=True):
         with open('CMakeCache.txt') as f:
             for line in f:
                 for v in vlist:
                     if line.startswith(v):
-                        ls = line.strip()
-                        vt = re.sub(_cache_entry, r'\1', ls)
-                        values[vt] = re.sub(_cache_entry, r'\3', ls)
+                        m = _cache_entry_rx.match(line.strip())
+                        if m is not None:
+                            values[m.group(1)] = _cache_value(m.group(3))
     return values
 
 
 def loadvars(builddir):
     """if builddir does not exist or does not have a cache, returns an
-    empty odict"""
-    v = odict()
+    empty dict"""
+    v = {}
     if builddir is None or not os.path.exists(builddir):
         return v
     c = os.path.join(builddir, 'CMakeCache.txt')
@@ -67,19 +118,21 @@ def loadvars(builddir):
         with open(c, 'r') as f:
             for line in f:
                 # logdbg("loadvars0", line.strip())
-                if not re.match(_cache_entry, line):
+                if line.startswith(('#', '//')):  # skip the comments
                     continue
-                ls = line.strip()
-                name = re.sub(_cache_entry, r'\1', ls)
-                vartype = re.sub(_cache_entry, r'\2', ls)[1:]
-                value = re.sub(_cache_entry, r'\3', ls)
+                m = _cache_entry_rx.match(line.strip())
+                if m is None:
+                    continue
+                name, vartype, value = m.groups()
+                vartype = vartype[1:]  # remove the leading :
+                value = _cache_value(value)
                 # logdbg("loadvars1", name, vartype, value)
                 v[name] = CMakeCacheVar(name, value, vartype)
     return v
 
 
 # -----------------------------------------------------------------------------
-class CMakeCache(odict):
+class CMakeCache(dict):
 
     def __init__(self, builddir=None):
         super().__init__(loadvars(builddir))
@@ -94,7 +147,7 @@ class CMakeCache(odict):
         return super().__init__(other)
 
     def getvars(self, names):
-        out = odict()
+        out = {}
         for n in names:
             v = self.get(n)
             out[n] = v
@@ -111,13 +164,13 @@ class CMakeCache(odict):
     def p(self, name, val, **kwargs):
         """set a path to a dir"""
         if util.in_windows():
-            val = re.sub(r'\\', r'/', val)
+            val = val.replace('\\', '/')
         return self.setvar(name, val, "PATH", **kwargs)
 
     def f(self, name, val, **kwargs):
         """set a path to a file"""
         if util.in_windows():
-            val = re.sub(r'\\', r'/', val)
+            val = val.replace('\\', '/')
         return self.setvar(name, val, "FILEPATH", **kwargs)
 
     def i(self, name, val, **kwargs):
@@ -142,12 +195,16 @@ class CMakeCache(odict):
             or not os.path.exists(builddir)
             or not os.path.exists(os.path.join(builddir, 'CMakeCache.txt'))):
             return False
-        tmp = odict()
+        tmp = {}
         for _, v in self.items():
             if not v.dirty:
                 continue
             tmp[v.name] = v.val
-        setcachevars(builddir, tmp)
+        # cmake reads the cache right after this, so the
+        # changes cannot be held back any longer
+        cf = CMakeCacheFile(builddir)
+        cf.apply(tmp)
+        cf.flush()
         for _, v in self.items():
             v.dirty = False
         self.dirty = False
@@ -157,6 +214,20 @@ class CMakeCache(odict):
 # -------------------------------------------------------------------------
 class CMakeCacheVar:
 
+    # a cache has thousands of vars, and there is one cache per build
+    __slots__ = ('name', 'val', 'vartype', 'dirty', 'from_input')
+
+    def __getstate__(self):
+        # the builds are serialized with pickle protocol 0, which
+        # requires this for classes with slots
+        return tuple(getattr(self, n) for n in __class__.__slots__)
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):  # serialized before the slots
+            state = tuple(state[n] for n in __class__.__slots__)
+        for n, v in zip(__class__.__slots__, state):
+            setattr(self, n, v)
+
     def __init__(self, name, val, vartype=None, dirty=False, from_input=False):
         self.name = name
         self.val = val
@@ -201,9 +272,13 @@ class CMakeCacheVar:
                     break
         else:
             equal = (self.val == val)
-        if not equal or (vartype is not None and vartype != self.vartype):
+        if vartype is not None:
+            # only the value is committed to the cache, so a different
+            # type alone (eg cmake stores the compilers as STRING rather
+            # than FILEPATH) does not make the var dirty
+            self.vartype = vartype
+        if not equal:
             self.val = val
-            self.vartype = vartype if vartype is not None else self.vartype
             self.dirty = True
             return True
         if force_dirty:
@@ -247,32 +322,55 @@ class CMakeSysInfo:
     def c_compiler(which_generator="default"):
         return __class__.var('CMAKE_C_COMPILER', which_generator)
 
+    @staticmethod
+    def version(which_generator="default"):
+        """the cmake version, as a tuple of ints"""
+        return __class__.var('CMAKE_VERSION', which_generator,
+                             lambda v: tuple(int(i) for i in v.split('.') if i.isdigit()))
+
     @staticmethod
     def var(var_name, which_generator="default", transform_fn=lambda x: x):
         gs = __class__._getstr
         return cacheattr(__class__, '_{}_{}'.format(var_name, _genid(which_generator)),
                          lambda: transform_fn(gs(var_name, which_generator)))
 
+    @staticmethod
+    def try_var(var_name, which_generator="default"):
+        """like var(), but returns None if the variable is not there"""
+        return __class__.info(which_generator).get(var_name)
+
     @staticmethod
     def info(which_generator="default"):
         return cacheattr(__class__, '_info_' + _genid(which_generator),
                          lambda: __class__.system_info(which_generator))
 
+    @staticmethod
+    def prewarm(generators):
+        """get the info for several generators at once, running the
+        required `cmake --system-information` commands concurrently.
+        Each of them is a separate process, so threads are enough."""
+        todo = {}  # the cacheattr() names of the missing infos
+        for g in generators:
+            name = '_info_' + _genid(g)
+            if not hasattr(__class__, name):
+                todo.setdefault(name, g)
+        if len(todo) < 2:
+            for g in todo.values():
+                __class__.info(g)
+            return
+        from concurrent.futures import ThreadPoolExecutor
+        from multiprocessing import cpu_count
+        with ThreadPoolExecutor(max_workers=min(len(todo), cpu_count())) as ex:
+            results = ex.map(__class__.system_info, todo.values())
+            for name, i in zip(todo.keys(), results):
+                setattr(__class__, name, i)
+
     @staticmethod
     def _getstr(var_name, which_generator):
-        regex = r'^{} "(.*)"'.format(var_name)
-        for l in __class__.info(which_generator):
-            #logdbg(l.strip("\n"), l.startswith(var_name), var_name)
-            if l.startswith(var_name):
-                l = l.strip("\n").lstrip(" ").rstrip(" ")
-                #logdbg(var_name, "startswith :", l)
-                if re.match(regex, l):
-                    s = re.sub(regex, r'\1', l)
-                    #logdbg(var_name, "result: '" + s + "'")
-                    return s
-        #logdbg("--------------------------------------\n", __class__.info(which_generator))
-        msg = "could not find variable {} in the output of `cmake --system-information -G '{}'`"
-        raise err.Error(msg, var_name, which_generator)
+        try:
+            return __class__.info(which_generator)[var_name]
+        except KeyError:
+            raise _var_not_found(var_name, which_generator) from None
 
     @staticmethod
     def system_info(gen):
@@ -283,15 +381,29 @@ class CMakeSysInfo:
         d = os.path.join(USER_DIR, 'cmake_info', p)
         p = os.path.join(d, 'info')
         logdbg("CMakeSystemInfo: path=", p)
+        j = p + '.json'
+        k = p + '.key'
         # https://stackoverflow.com/questions/7015587/python-difference-of-2-datetimes-in-months
         if os.path.exists(p) and util.time_since_modification(p).months < 1:
             logdbg("CMakeSystemInfo: asked info for", gen, "... found", p)
-            with open(p, "r") as f:
-                i = f.readlines()
+            i = None
+            # the parsed vars are stored alongside the raw info,
+            # so that the info is parsed only once
+            if os.path.exists(j) and os.path.getmtime(j) >= os.path.getmtime(p):
+                import json
+                with open(j, "r") as f:
+                    i = json.load(f)
+            if not i:
+                with open(p, "r") as f:
+                    i = _parse_sysinfo(f)  # go through the file line by line
                 if i:
-                    return i
-                else:
-                    logdbg("CMakeSystemInfo: info for gen", gen, "is empty...")
+                    _save_sysinfo(j, i)
+            if not i:
+                logdbg("CMakeSystemInfo: info for gen", gen, "is empty...")
+            elif _read_sysinfo_key(k) == _sysinfo_key(i):
+                return i
+            else:
+                logdbg("CMakeSystemInfo: cmake or the compilers changed; info for gen", gen, "is stale...")
         #
         if isinstance(gen, Generator):
             cmd = ['cmake'] + gen.configure_args() + ['--system-information']
@@ -315,21 +427,80 @@ class CMakeSysInfo:
         _remove_invalid_args_from_sysinfo_cmd(cmd)
         print("\ncmany: CMake information for generator '{}' was not found. Creating and storing... cmd={}".format(gen, cmd))
         #
-        if not os.path.exists(d):
-            os.makedirs(d)
-        with setcwd(d):
-            out = runsyscmd(cmd, echo_output=False, capture_output=True)
+        os.makedirs(d, exist_ok=True)  # this may race with other threads
+        # use cwd instead of setcwd(), as this may be run from several
+        # threads (see prewarm())
+        out = runsyscmd(cmd, echo_output=False, capture_output=True, cwd=d)
         logdbg("cmany: finished generating information for generator '{}'\n".format(gen), out, cmd)
         out = out.strip()
         if not out:
-            from err import InvalidGenerator
-            raise InvalidGenerator(gen, "for --system-information. cmd='{}'".format(cmd))
+            raise err.InvalidGenerator(gen, "for --system-information. cmd='{}'".format(cmd))
         with open(p, "w") as f:
             f.write(out)
-        i = out.split("\n")
+        i = _parse_sysinfo(out.splitlines())
+        _save_sysinfo(j, i)
+        _save_sysinfo(k, _sysinfo_key(i))
         return i
 
 
+def _var_not_found(var_name, which_generator):
+    msg = "could not find variable {} in the output of `cmake --system-information -G '{}'`"
+    return err.Error(msg, var_name, which_generator)
+
+
+def _parse_sysinfo(lines):
+    """parse the lines of the output of `cmake --system-information`
+    into a dict mapping each variable to its value. When a variable
+    appears more than once, the first occurrence is kept. The lines can
+    be any iterable, eg an open file."""
+    d = {}
+    # the lines of interest look like: VAR "value"
+    for l in lines:
+        var, sep, rest = l.partition(' "')
+        if not sep or not var or ' ' in var or '\t' in var:
+            continue
+        val, sep, _ = rest.rpartition('"')
+        if sep:
+            d.setdefault(var, val)
+    return d
+
+
+def _sysinfo_key(parsed_info):
+    """identify the programs which produced the info: cmake, and the
+    compilers it found. With the size and modification time of each,
+    upgrading any of them makes the stored info stale."""
+    def _stat(path):
+        try:
+            st = os.stat(path)
+            return [path, st.st_size, st.st_mtime_ns]
+        except (OSError, TypeError):
+            return [path]
+    cmake = util.which('cmake')
+    cmake = os.path.realpath(cmake) if cmake else None
+    return {
+        'cmake': _stat(cmake),
+        'CMAKE_C_COMPILER': _stat(parsed_info.get('CMAKE_C_COMPILER')),
+        'CMAKE_CXX_COMPILER': _stat(parsed_info.get('CMAKE_CXX_COMPILER')),
+        'CC': os.environ.get('CC'),
+        'CXX': os.environ.get('CXX'),
+    }
+
+
+def _read_sysinfo_key(filename):
+    import json
+    try:
+        with open(filename, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_sysinfo(filename, parsed_info):
+    import json
+    with open(filename, "w") as f:
+        json.dump(parsed_info, f)
+
+
 def _remove_invalid_args_from_sysinfo_cmd(cmd):
     gotit = None
     # remove compile commands args
@@ -356,7 +527,7 @@ def _genid(gen):
     from .generator import Generator
     p = gen.sysinfo_name if isinstance(gen, Generator) else gen
     if isinstance(gen, list): p = " ".join(p)
-    p = re.sub(r'[() ]', '_', p)
+    p = _genid_rx.sub('_', p)
     return p
 
 
@@ -389,9 +560,9 @@ def _genid(gen):
 def extract_toolchain_compilers(toolchain):
     with open(toolchain) as f:
         lines = f.readlines()
-        out = odict()
+        out = {}
         for l in lines:
-            res = re.search(r'(set|SET)\ ?\(\ ?(CMAKE_.*?_COMPILER) (.*?)\ ?\)', l)
+            res = _toolchain_compiler_rx.search(l)
             if res:
                 res = res.groups()
                 out[res[1]] = res[2]
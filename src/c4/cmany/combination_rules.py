@@ -1,4 +1,5 @@
 import re
+import itertools
 
 
 # -----------------------------------------------------------------------------
@@ -29,8 +30,11 @@ class CombinationRule:
             matches_all = True
             matches_none = True
             matches_any = False
+            # the tag is the same for every pattern
+            from .build import Build
+            tag = Build.get_tag(s, a, c, t, v)
             for pattern in self.patterns:
-                if __class__.pattern_matches(pattern, s, a, c, t, v):
+                if re.search(pattern, tag):
                     matches_any = True
                     matches_none = False
                 else:
@@ -77,21 +81,6 @@ class CombinationRule:
                 result = in_patterns
             return result
 
-    @staticmethod
-    def pattern_matches(pattern, s, a, c, t, v):
-        from .build import Build
-        #for i in (s, a, c, t, v):
-        #    if re.search(pattern, str(i)):
-        #        # print("GOT A MATCH:", self.rule, i)
-        #        return True
-        s = Build.get_tag(s, a, c, t, v)
-        # print(s, type(s))
-        if re.search(pattern, s):
-            # print("GOT A TAG MATCH:", self.rule, s)
-            return True
-        # print("NO MATCH:", self.rule, s)
-        return False
-
 
 # -----------------------------------------------------------------------------
 class CombinationRules:
@@ -101,30 +90,24 @@ class CombinationRules:
         for x_or_i, any_or_all, rules in specs:
             crc = CombinationRule(x_or_i, any_or_all, rules)
             self.rules.append(crc)
+        self._valid = {}  # results for each combination of names
 
     def is_valid(self, s, a, c, t, v):
-        result = 1
-        for r in self.rules:
-            result = result & r.is_valid(s, a, c, t, v)
+        if not self.rules:
+            return True
+        key = (s.name, a.name, c.name, t.name, v.name)
+        result = self._valid.get(key)
+        if result is None:
+            result = all(r.is_valid(s, a, c, t, v) for r in self.rules)
+            self._valid[key] = result
         return result
 
     def valid_combinations(self, systems, archs, comps, types, variants):
         combs = []
-        for s in systems:
-            for a in archs:
-                for c in comps:
-                    for t in types:
-                        for v in variants:
-                            valid = True
-                            if not self.is_valid(s, a, c, t, v):
-                                valid = False
-                            for item in (s, a, c, t, v):
-                                crs = item.combination_rules
-                                #for idx, r in enumerate(crs.rules):
-                                #    print((s, a, c, t, v), ":", item, ": rule[{}]".format(idx), r.x_or_i, r.what, r.patterns)
-                                if not crs.is_valid(s, a, c, t, v):
-                                    valid = False
-                                    break
-                            if valid:
-                                combs.append((s, a, c, t, v))
+        for comb in itertools.product(systems, archs, comps, types, variants):
+            if not self.is_valid(*comb):
+                continue
+            # the items can bring their own rules
+            if all(item.combination_rules.is_valid(*comb) for item in comb):
+                combs.append(comb)
         return combs
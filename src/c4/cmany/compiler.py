@@ -10,6 +10,15 @@ from . import vsinfo
 from . import err
 
 
+# version regexes used in Compiler.get_version()
+_vregex = r'(\d+\.\d+)\.\d+'
+_version_rx = re.compile(_vregex)
+_apple_llvm_rx = re.compile(r'Apple LLVM version ' + _vregex + '.*')
+_clang_rx = re.compile(r'clang version ' + _vregex + '.*')
+_icpc_rx = re.compile(r'icpc \(ICC\) ' + _vregex + '.*')
+_icc_rx = re.compile(r'icc \(ICC\) ' + _vregex + '.*')
+
+
 # -----------------------------------------------------------------------------
 class Compiler(BuildItem):
     """Represents a compiler choice"""
@@ -20,12 +29,12 @@ class Compiler(BuildItem):
 
     @staticmethod
     def default_str():
-        if str(System.default()) != "windows":
-            cpp = CMakeSysInfo.cxx_compiler()
-        else:
+        def fn():
+            if System.default_str() != "windows":
+                return CMakeSysInfo.cxx_compiler()
             vs = vsinfo.find_any()
-            cpp = vs.name if vs is not None else CMakeSysInfo.cxx_compiler()
-        return cpp
+            return vs.name if vs is not None else CMakeSysInfo.cxx_compiler()
+        return util.cacheattr(__class__, '_default_str', fn)
 
     def is_trivial(self):
         """reimplement BuildItem.is_trivial because our name is altered from the
@@ -118,60 +127,74 @@ class Compiler(BuildItem):
                                  echo_output=False, capture_output=True)
             out = out.strip("\n")
             return out
+        # the version is taken from -dumpversion, and not from --version:
+        # the build names depend on it, and depending on how gcc was
+        # configured, -dumpversion gives only the major version (eg 12)
+        def dumpversion():
+            return _version_rx.sub(r'\1', slntout([path, '-dumpversion']))
         # is this visual studio?
         if hasattr(self, "vs"):
             return self.vs.name, str(self.vs.year), self.vs.name
+        # the predefined macros of c++/cc tell what compiler is behind
+        # them. Getting them does not depend on the output of --version,
+        # so run both commands at the same time.
+        def get_macros():
+            try:  # if this fails, just go on. It's not really needed.
+                with tempfile.NamedTemporaryFile(suffix=".cpp", prefix="cmany.", delete=False) as f:
+                    macros = slntout([path, '-dM', '-E', f.name])
+                    os.unlink(f.name)
+                return macros.split("\n")
+            except Exception:
+                return []
         # other compilers
         # print("cmp: found compiler:", path)
-        out = slntout([path, '--version'])
+        base = os.path.basename(path)
+        # print("cmp base:", base)
+        macros = None
+        if base.startswith("c++") or base.startswith("cc"):
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=1) as ex:
+                macros = ex.submit(get_macros)
+                out = slntout([path, '--version'])
+            macros = macros.result()
+        else:
+            out = slntout([path, '--version'])
         version_full = out.split("\n")[0]
         splits = version_full.split(" ")
         name = splits[0].lower()
         # print("cmp: version:", name, "---", version_full, "---")
-        vregex = r'(\d+\.\d+)\.\d+'
-        base = os.path.basename(path)
-        # print("cmp base:", base)
-        if base.startswith("c++") or base.startswith("cc"):
-            try:  # if this fails, just go on. It's not really needed.
-                with tempfile.NamedTemporaryFile(suffix=".cpp", prefix="cmany.", delete=False) as f:
-                    macros = slntout([path, '-dM', '-E', f.name])
-                    os.unlink(f.name)
-                macros = macros.split("\n")
-            except Exception as e:
-                macros = []
+        if macros is not None:
             for m in sorted(macros):
-                if re.search("#define __clang__", m):
-                    name = "clang++" if re.search(r"\+\+", path) else "clang"
+                if "#define __clang__" in m:
+                    name = "clang++" if "++" in path else "clang"
                     break
-                elif re.search("#define __GNUC__", m):
-                    name = "g++" if re.search(r"\+\+", path) else "gcc"
+                elif "#define __GNUC__" in m:
+                    name = "g++" if "++" in path else "gcc"
                     break
         if name.startswith("g++") or name.startswith("gcc"):
             # print("g++: version:", name, name.find('++'))
             name = "g++" if name.find('++') != -1 else 'gcc'
             # print("g++: version:", name, name.find('++'))
-            version = slntout([path, '-dumpversion'])
-            version = re.sub(vregex, r'\1', version)
+            version = dumpversion()
             # print("gcc version:", version, "---")
         elif name.startswith("clang"):
             name = "clang++" if path.find('clang++') != -1 else 'clang'
-            if re.search('Apple LLVM', version_full):
+            if 'Apple LLVM' in version_full:
                 name = "apple_llvm"
-                version = re.sub(r'Apple LLVM version ' + vregex + '.*', r'\1', version_full)
+                version = _apple_llvm_rx.sub(r'\1', version_full)
                 print("apple_llvm version:", version, "---")
             else:
-                version = re.sub(r'clang version ' + vregex + '.*', r'\1', version_full)
+                version = _clang_rx.sub(r'\1', version_full)
                 # print("clang version:", version, "---")
         elif name.startswith("icpc") or name.startswith("icc"):
             name = "icc" if name.startswith("icc") else "icpc"
-            if re.search(r'icpc \(ICC\) ' + vregex + '.*', version_full):
-                version = re.sub(r'icpc \(ICC\) ' + vregex + '.*', r'\1', version_full)
+            if _icpc_rx.search(version_full):
+                version = _icpc_rx.sub(r'\1', version_full)
             else:
-                version = re.sub(r'icc \(ICC\) ' + vregex + '.*', r'\1', version_full)
+                version = _icc_rx.sub(r'\1', version_full)
             # print("icc version:", version, "---")
         else:
-            version = slntout([path, '-dumpversion'])
-            version = re.sub(vregex, r'\1', version)
+            version = dumpversion()
         #
         return name, version, version_full
 
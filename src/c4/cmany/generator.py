@@ -1,10 +1,26 @@
+import os
+import itertools
+
 from . import cmake
+from . import util
 from . import vsinfo
 
 from .build_item import BuildItem
 from .err import TooManyTargets
 
 
+# the number of builds processed at the same time by the forked
+# processes of Project._execute_forked(). The jobs of each build are
+# divided among them. This is process-local, so it is not saved with
+# the serialized builds.
+_outer_jobs = 1
+
+
+def set_outer_jobs(num):
+    global _outer_jobs
+    _outer_jobs = num
+
+
 # -----------------------------------------------------------------------------
 class Generator(BuildItem):
 
@@ -20,6 +36,17 @@ class Generator(BuildItem):
         s = cmake.CMakeSysInfo.generator()
         return s
 
+    @staticmethod
+    def preferred(name):
+        """use Ninja instead of Unix Makefiles when it is available. Ninja
+        builds are usually faster. This is done only when the user did not
+        ask cmake for a generator through the CMAKE_GENERATOR env var."""
+        if (name == "Unix Makefiles"
+                and not os.environ.get("CMAKE_GENERATOR")
+                and util.which("ninja") is not None):
+            return "Ninja"
+        return name
+
     def __init__(self, name, build, num_jobs):
         if isinstance(name, list):
             #more_args = name[1:]
@@ -68,39 +95,63 @@ class Generator(BuildItem):
         return args
 
     def cmd(self, targets, override_build_type=None, override_num_jobs=None):
+        # WATCHOUT: the generator is serialized with the build, so
+        # choose here rather than storing the choice in __init__
         if self.is_makefile:
-            return ['make', '-j', str(self.num_jobs)] + targets
+            return self._cmd_make(targets)
         elif self.is_ninja:
-            return ['ninja', '-j', str(self.num_jobs)] + targets
-        else:
-            bt = str(self.build.build_type)
-            if len(targets) > 1:
-                raise TooManyTargets(self)
-            if not self.is_msvc:
-                cmd = ['cmake', '--build', '.', '--target', targets[0], '--config', bt]
-            else:
-                # # if a target has a . in the name, it must be substituted for _
-                # targets_safe = [re.sub(r'\.', r'_', t) for t in targets]
-                # if len(targets_safe) != 1:
-                #     raise Exception("msbuild can only build one target at a time: was " + str(targets_safe))
-                # t = targets_safe[0]
-                # pat = os.path.join(self.build.builddir, t + '*.vcxproj')
-                # projs = glob.glob(pat)
-                # if len(projs) == 0:
-                #     msg = "could not find vcx project for this target: {} (glob={}, got={})".format(t, pat, projs)
-                #     raise Exception(msg)
-                # elif len(projs) > 1:
-                #     msg = "multiple vcx projects for this target: {} (glob={}, got={})".format(t, pat, projs)
-                #     raise Exception(msg)
-                # proj = projs[0]
-                # cmd = [self.build.compiler.vs.msbuild, proj,
-                #        '/property:Configuration='+bt,
-                #        '/maxcpucount:' + str(self.num_jobs)]
-                cmd = ['cmake', '--build', '.', '--target', targets[0], '--config', bt,
-                       '--',
-                       #'/property:Configuration='+bt,
-                       '/maxcpucount:' + str(self.num_jobs)]
-            return cmd
+            return self._cmd_ninja(targets)
+        elif self.is_msvc:
+            return self._cmd_msvc(targets)
+        return self._cmd_cmake(targets)
+
+    def _jobs(self):
+        return str(max(1, int(self.num_jobs) // _outer_jobs))
+
+    def _cmd_make(self, targets):
+        return ['make', '-j', self._jobs()] + targets
+
+    def _cmd_ninja(self, targets):
+        return ['ninja', '-j', self._jobs()] + targets
+
+    def _cmd_cmake(self, targets):
+        bt = str(self.build.build_type)
+        cmd = ['cmake', '--build', '.'] + self._target_args(targets) + ['--config', bt]
+        if cmake.CMakeSysInfo.version() >= (3, 12):  # --parallel is new in 3.12
+            cmd += ['--parallel', self._jobs()]
+        return cmd
+
+    def _cmd_msvc(self, targets):
+        # # if a target has a . in the name, it must be substituted for _
+        # targets_safe = [re.sub(r'\.', r'_', t) for t in targets]
+        # if len(targets_safe) != 1:
+        #     raise Exception("msbuild can only build one target at a time: was " + str(targets_safe))
+        # t = targets_safe[0]
+        # pat = os.path.join(self.build.builddir, t + '*.vcxproj')
+        # projs = glob.glob(pat)
+        # if len(projs) == 0:
+        #     msg = "could not find vcx project for this target: {} (glob={}, got={})".format(t, pat, projs)
+        #     raise Exception(msg)
+        # elif len(projs) > 1:
+        #     msg = "multiple vcx projects for this target: {} (glob={}, got={})".format(t, pat, projs)
+        #     raise Exception(msg)
+        # proj = projs[0]
+        # cmd = [self.build.compiler.vs.msbuild, proj,
+        #        '/property:Configuration='+bt,
+        #        '/maxcpucount:' + str(self.num_jobs)]
+        bt = str(self.build.build_type)
+        return (['cmake', '--build', '.'] + self._target_args(targets) +
+                ['--config', bt,
+                 '--',
+                 #'/property:Configuration='+bt,
+                 '/maxcpucount:' + self._jobs()])
+
+    def _target_args(self, targets):
+        """each target must be a separate --target argument. cmake --build
+        only accepts several of them since cmake 3.15"""
+        if len(targets) > 1 and cmake.CMakeSysInfo.version() < (3, 15):
+            raise TooManyTargets(self)
+        return list(itertools.chain.from_iterable(('--target', t) for t in targets))
 
     def install(self):
         bt = str(self.build.build_type)
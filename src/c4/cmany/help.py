@@ -2,11 +2,11 @@
 
 import os.path as osp
 import sys
-from collections import OrderedDict as odict
 
 from c4.cmany import conf
 
-topics = odict()
+# plain dicts keep the insertion order, which is the order of the listing
+topics = {}
 
 
 class Topic:
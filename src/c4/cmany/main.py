@@ -3,32 +3,30 @@
 import sys
 import argcomplete
 
-from collections import OrderedDict as odict
-
 from c4.cmany.project import Project as Project
 from c4.cmany import args as c4args
 from c4.cmany import help as c4help
 from c4.cmany import err
 
 
-cmds = odict([
-    ('help', ['h']),
-    ('configure', ['c']),
-    ('reconfigure', ['rc']),
-    ('build', ['b']),
-    ('rebuild', ['rb']),
-    ('install', ['i']),
-    ('reinstall', ['ri']),
-    ('run', ['r']),
-    ('show_vars', ['sv']),
-    ('show_builds', ['sb']),
-    ('show_build_names', ['sn']),
-    ('show_build_dirs', ['sd']),
-    ('show_targets', ['st']),
-    ('create_proj', ['cp']),
-    ('export_compile_commands', ['xc']),
-    ('export_vs', []),
-])
+cmds = {
+    'help': ['h'],
+    'configure': ['c'],
+    'reconfigure': ['rc'],
+    'build': ['b'],
+    'rebuild': ['rb'],
+    'install': ['i'],
+    'reinstall': ['ri'],
+    'run': ['r'],
+    'show_vars': ['sv'],
+    'show_builds': ['sb'],
+    'show_build_names': ['sn'],
+    'show_build_dirs': ['sd'],
+    'show_targets': ['st'],
+    'create_proj': ['cp'],
+    'export_compile_commands': ['xc'],
+    'export_vs': [],
+}
 
 
 def cmd_abbrevs():
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 
 import os
-import glob
-import json
+import sys
 import copy
 import timeit
+import tempfile
+import traceback
+import types
 from collections import OrderedDict as odict
 
 from ruamel import yaml as yaml
@@ -21,10 +23,12 @@ from .architecture import Architecture
 from .compiler import Compiler
 from .variant import Variant
 from .build import Build
+from .generator import Generator
 
 from .combination_rules import CombinationRules
 from .cmake import getcachevars
 from . import cmake
+from . import generator
 from . import err
 from .util import path_exists as _pexists
 from .util import logdbg as dbg
@@ -42,6 +46,62 @@ def _getdir(attr_name, default, kwargs, cwd):
     return d
 
 
+# -----------------------------------------------------------------------------
+def _build_dir_names(build_dir):
+    """the names of the subdirs of the build root"""
+    try:
+        with os.scandir(build_dir) as it:
+            return [e.name for e in it if e.is_dir()]
+    except FileNotFoundError:
+        return []
+
+
+def _configure_outer_jobs(kwargs):
+    """configuring is mostly serial work done by cmake in separate build
+    trees, so by default configure one build per cpu at the same time"""
+    if kwargs.get('deps') and kwargs.get('deps_prefix'):
+        # but not when the builds install their deps to the same prefix
+        return 1
+    from multiprocessing import cpu_count
+    return cpu_count()
+
+
+def _can_fork():
+    import multiprocessing
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+# (fn, builds, jobs, logdir) of the current Project._execute_forked().
+# This is inherited by the forked processes, so that the builds are not
+# pickled.
+_forked_job = None
+
+
+def _run_forked(i):
+    fn, builds, jobs, logdir = _forked_job
+    b = builds[i]
+    # split the inner jobs among the builds running at the same time.
+    # This is not set in the build, as it would be saved with it.
+    generator.set_outer_jobs(jobs)
+    # the output goes to a file, which is passed by name: the output
+    # may be large, so it is not sent back through the pool
+    log = os.path.join(logdir, str(i))
+    with open(log, "wb") as out:
+        with util.stdout_redirected(out), util.stdout_redirected(out, stdout=sys.stderr):
+            t = timeit.default_timer()
+            e = None
+            try:
+                fn(b)
+            # send only what is needed to recreate the exception: it may
+            # not be possible to unpickle the exception itself
+            except err.BuildError as exc:
+                e = (True, exc.context, exc.cmd, str(exc.exc))
+            except Exception as exc:
+                e = (False, type(exc).__name__, str(exc), traceback.format_exc())
+            t = timeit.default_timer() - t
+    return i, t, e, log
+
+
 # -----------------------------------------------------------------------------
 class Project:
 
@@ -51,6 +111,7 @@ class Project:
         self.num_jobs = kwargs.get('jobs')
         self.targets = kwargs.get('target')
         self.continue_on_fail = kwargs.get('continue')
+        self._resolved_items = {}  # see add_build()
         #
         cwd = util.abspath(os.getcwd())
         pdir = kwargs.get('proj_dir')
@@ -110,13 +171,19 @@ class Project:
         self.builds = [build]
 
     def _init_with_glob(self, **kwargs):
+        import fnmatch
         g = kwargs.get('glob')
         self.builds = []
+        # list the build root only once for all the patterns
+        names = _build_dir_names(self.build_dir)
+        seen = set()
         for pattern in g:
-            bp = os.path.join(self.build_dir, pattern)
-            li = glob.glob(bp)
-            for b in li:
-                build = Build.deserialize(b)
+            for b in fnmatch.filter(names, pattern):
+                # like glob, match hidden dirs only explicitly
+                if b in seen or (b.startswith('.') and not pattern.startswith('.')):
+                    continue
+                seen.add(b)
+                build = Build.deserialize(os.path.join(self.build_dir, b))
                 self.builds.append(build)
 
     def _init_with_build_items(self, **kwargs):
@@ -127,6 +194,7 @@ class Project:
         dbg("combinations:", combs)
         self.combination_rules = cr
         #
+        __class__._prewarm_sysinfo(s, c)
         self.builds = []
         for comb in combs:
             dbg("adding build from combination:", comb)
@@ -138,20 +206,35 @@ class Project:
         self.build_types = t
         self.variants = v
         #
-        # add new build params as needed to deal with adjusted builds
-        def _addnew(b, name):
-            a = getattr(b, name)
-            ali = getattr(self, name + 's')
-            if not [elm for elm in ali if str(elm) == str(a)]:
-                ali.append(a)
+        # add new build params as needed to deal with adjusted builds.
+        # Keep the names of each kind in a set, to avoid rescanning
+        # the lists for every build.
+        kinds = ('system', 'architecture', 'build_type', 'compiler', 'variant')
+        known = {k: set(str(i) for i in getattr(self, k + 's')) for k in kinds}
         for b in self.builds:
             if not b.adjusted:
                 continue
-            _addnew(b, 'system')
-            _addnew(b, 'architecture')
-            _addnew(b, 'build_type')
-            _addnew(b, 'compiler')
-            _addnew(b, 'variant')
+            for k in kinds:
+                i = getattr(b, k)
+                if str(i) not in known[k]:
+                    known[k].add(str(i))
+                    getattr(self, k + 's').append(i)
+
+    @staticmethod
+    def _prewarm_sysinfo(systems, compilers):
+        """creating the builds needs the cmake system info of their
+        generators. Get it for all the generators at once, before that."""
+        gens = {}
+        for c in compilers:
+            if c.is_msvc:
+                # the generator needs only the compiler of its build
+                g = Generator(c.vs.gen, types.SimpleNamespace(compiler=c), 1)
+                gens.setdefault(g.sysinfo_name, g)
+            else:
+                for s in systems:
+                    g = Generator(Build.default_generator(s), None, 1)
+                    gens.setdefault(g.sysinfo_name, g)
+        cmake.CMakeSysInfo.prewarm(gens.values())
 
     @staticmethod
     def get_build_items(**kwargs):
@@ -226,25 +309,40 @@ class Project:
 
     def add_build(self, system, arch, compiler, build_type, variant):
         # duplicate the build items, as they may be mutated due
-        # to translation of their flags for the compiler
+        # to translation of their flags for the compiler. This is done
+        # only once for each item and compiler; the result is shared
+        # by all the builds with that compiler.
+        def _memo(item, make):
+            key = (id(item), id(compiler))
+            d = self._resolved_items.get(key)
+            if d is None or d[0] is not item or d[1] is not compiler:
+                d = (item, compiler, make())
+                self._resolved_items[key] = d
+            return d[2]
         def _dup_item(item):
-            i = copy.deepcopy(item)
-            i.flags.resolve_flag_aliases(compiler, aliases=self.configs.flag_aliases)
-            return i
+            def make():
+                i = copy.deepcopy(item)
+                i.flags.resolve_flag_aliases(compiler, aliases=self.configs.flag_aliases)
+                return i
+            return _memo(item, make)
+        def _all_builds_flags():
+            f = BuildFlags('all_builds', **self.kwargs)
+            f.resolve_flag_aliases(compiler, aliases=self.configs.flag_aliases)
+            return f
         s = _dup_item(system)
         a = _dup_item(arch)
         t = _dup_item(build_type)
-        c = _dup_item(compiler)
+        # builds may add flags to their compiler, so it can't be shared
+        c = copy.deepcopy(_dup_item(compiler))
         v = _dup_item(variant)
-        #
-        f = BuildFlags('all_builds', **self.kwargs)
-        f.resolve_flag_aliases(compiler, aliases=self.configs.flag_aliases)
+        f = _memo(BuildFlags, _all_builds_flags)
         #
         # create the build
         dbg("adding build:", s, a, t, c, v, f)
         b = Build(self.root_dir, self.build_dir, self.install_dir,
                   s, a, t, c, v, f,
-                  self.num_jobs, dict(self.kwargs))
+                  self.num_jobs, dict(self.kwargs),
+                  check_paths=False)  # this was done in __init__()
         #
         # When a build is created, its parameters may have been adjusted
         # because of an incompatible generator specification.
@@ -257,28 +355,24 @@ class Project:
         return True  # build successfully added
 
     def exists(self, build):
-        for b in self.builds:
-            if str(b.tag) == str(build.tag):
-                return True
-        return False
+        tag = str(build.tag)
+        return any(b.tag == tag for b in self.builds)
 
     def select(self, **kwargs):
-        out = [b for b in self.builds]
-        def _h(kw, attr):
-            global out
+        # (attribute, wanted name) for each of the given restrictions
+        filters = []
+        for kw, attr in (("sys", "system"),
+                         ("arch", "architecture"),
+                         ("compiler", "compiler"),
+                         ("build_type", "build_type"),
+                         ("variant", "variant")):
             g = kwargs.get(kw)
             if g is not None:
-                lo = []
-                for b in out:
-                    if str(getattr(b, attr)) == str(g):
-                        lo.append(b)
-                out = lo
-        _h("sys", "system")
-        _h("arch", "architecture")
-        _h("compiler", "compiler")
-        _h("build_type", "build_type")
-        _h("variant", "variant")
-        return out
+                filters.append((attr, str(g)))
+        if not filters:
+            return list(self.builds)
+        return [b for b in self.builds
+                if all(str(getattr(b, attr)) == g for attr, g in filters)]
 
     def create_tree(self, **restrict_to):
         builds = self.select(**restrict_to)
@@ -288,18 +382,17 @@ class Project:
             # print(b, ":", d)
 
     def configure(self, **restrict_to):
-        if not os.path.exists(self.build_dir):
-            os.makedirs(self.build_dir)
-        self._execute(Build.configure, "Configure", silent=False, **restrict_to)
+        os.makedirs(self.build_dir, exist_ok=True)
+        self._execute(Build.configure, "Configure", silent=False,
+                      default_outer_jobs=_configure_outer_jobs(self.kwargs), **restrict_to)
 
     def reconfigure(self, **restrict_to):
-        if not os.path.exists(self.build_dir):
-            os.makedirs(self.build_dir)
-        self._execute(Build.reconfigure, "Reconfigure", silent=False, **restrict_to)
+        os.makedirs(self.build_dir, exist_ok=True)
+        self._execute(Build.reconfigure, "Reconfigure", silent=False,
+                      default_outer_jobs=_configure_outer_jobs(self.kwargs), **restrict_to)
 
     def export_compile_commands(self, **restrict_to):
-        if not os.path.exists(self.build_dir):
-            os.makedirs(self.build_dir)
+        os.makedirs(self.build_dir, exist_ok=True)
         self._execute(Build.export_compile_commands, "Export compile commands", silent=False, **restrict_to)
 
     def build(self, **restrict_to):
@@ -330,14 +423,17 @@ class Project:
         confs = []
         for b in self.builds:
             confs.append(b.json_data())
+        import json
         jd = odict([('configurations', confs)])
         with open(self.configfile, 'w') as f:
             json.dump(jd, f, indent=2)
 
     def show_vars(self, varlist):
         varv = odict()
-        pat = os.path.join(self.build_dir, '*', 'CMakeCache.txt')
-        g = glob.glob(pat)
+        g = [os.path.join(self.build_dir, b, 'CMakeCache.txt')
+             for b in _build_dir_names(self.build_dir)
+             if not b.startswith('.')]
+        g = [p for p in g if os.path.exists(p)]
         md = 0
         mv = 0
         for p in g:
@@ -373,7 +469,43 @@ class Project:
         for t in self.builds[0].get_targets():
             print(t)
 
-    def _execute(self, fn, msg, silent, **restrict_to):
+    def _execute_forked(self, fn, builds, jobs, header, footer):
+        """process the builds in up to the given number of forked processes
+        at the same time. The output of each build is captured, and shown
+        in one go when the build finishes."""
+        import multiprocessing
+        import shutil
+        global _forked_job
+        try:
+            with tempfile.TemporaryDirectory(prefix="cmany.") as logdir:
+                # this must be set before the pool forks the processes
+                _forked_job = (fn, builds, jobs, logdir)
+                with multiprocessing.get_context('fork').Pool(jobs) as pool:
+                    results = pool.imap_unordered(_run_forked, range(len(builds)))
+                    for count, (i, t, e, log) in enumerate(results):
+                        b = builds[i]
+                        header(i, b, count == 0)
+                        sys.stdout.flush()
+                        with open(log, "rb") as out:
+                            shutil.copyfileobj(out, sys.stdout.buffer)
+                        os.remove(log)
+                        sys.stdout.flush()
+                        if e is not None:
+                            is_build_error, *e = e
+                            if not is_build_error:
+                                # like when processing the builds one
+                                # at a time, this stops everything
+                                name, what, tb = e
+                                raise err.Error("{}: {}: {}\n{}", b, name, what, tb)
+                            context, cmd, exc = e
+                            e = err.BuildError(context, b, cmd, exc)
+                        footer(i, b, t, e)
+                        if e is not None and not self.continue_on_fail:
+                            raise e  # leaving the pool terminates the others
+        finally:
+            _forked_job = None
+
+    def _execute(self, fn, msg, silent, default_outer_jobs=1, **restrict_to):
         builds = self.select(**restrict_to)
         failed = odict()
         durations = odict()
@@ -401,8 +533,8 @@ class Project:
                 nt(b)
             nt("===============================================")
         #
-        for i, b in enumerate(builds):
-            if i > 0:
+        def header(i, b, first):
+            if not first:
                 nt("\n")
             nt("-----------------------------------------------")
             if num > 1:
@@ -410,20 +542,13 @@ class Project:
             else:
                 nt(msg, b)
             nt("-----------------------------------------------")
-            #
-            t = timeit.default_timer()
-            try:
-                # this is where it happens
-                fn(b)  # <-- here
+        def footer(i, b, t, e):
+            if e is None:
                 word, logger = "finished", dn
-            # exceptions thrown from builds inherit this type
-            except err.BuildError as e:
+            else:
                 word, logger = "failed", er
                 util.logerr(f"{b} failed! {e}")
                 failed[b] = e
-                if not self.continue_on_fail:
-                    raise
-            t = timeit.default_timer() - t
             hrt = util.human_readable_time(t)
             durations[b] = (t, hrt)
             if num > 1:
@@ -433,6 +558,34 @@ class Project:
                 info = f"{word} building ({hrt})"
             logger(msg + ": " + info + ":",  b)
         #
+        outer_jobs = self.kwargs.get('outer_jobs')
+        explicit = outer_jobs is not None
+        if not explicit:
+            outer_jobs = default_outer_jobs
+        outer_jobs = min(num, max(1, int(outer_jobs)))
+        if outer_jobs > 1 and not _can_fork():
+            if explicit:
+                util.logwarn("WARNING: --outer-jobs is not supported in this platform. Processing the builds one at a time.")
+            outer_jobs = 1
+        if outer_jobs > 1:
+            self._execute_forked(fn, builds, outer_jobs, header, footer)
+        else:
+            for i, b in enumerate(builds):
+                header(i, b, i == 0)
+                #
+                t = timeit.default_timer()
+                e = None
+                try:
+                    # this is where it happens
+                    fn(b)  # <-- here
+                # exceptions thrown from builds inherit this type
+                except err.BuildError as e_:
+                    e = e_
+                    if not self.continue_on_fail:
+                        util.logerr(f"{b} failed! {e}")
+                        raise
+                footer(i, b, timeit.default_timer() - t, e)
+        #
         nt("-----------------------------------------------")
         if num > 1:
             if failed:
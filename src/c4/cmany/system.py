@@ -1,5 +1,6 @@
 from .build_item import BuildItem
 from .cmake import CMakeSysInfo
+from . import util
 
 
 # -----------------------------------------------------------------------------
@@ -13,7 +14,9 @@ class System(BuildItem):
 
     @staticmethod
     def default_str():
-        s = CMakeSysInfo.system_name()
-        if s == "mac os x" or s == "Darwin":
-            s = "mac"
-        return s
+        def fn():
+            s = CMakeSysInfo.system_name()
+            if s == "mac os x" or s == "Darwin":
+                s = "mac"
+            return s
+        return util.cacheattr(__class__, '_default_str', fn)
@@ -5,8 +5,6 @@ import sys
 import subprocess
 import platform
 import copy
-import datetime
-from dateutil.relativedelta import relativedelta
 import shlex
 
 import colorama #from colorama import Fore, Back, Style, init
@@ -379,36 +377,78 @@ def remove_if(fname):
         os.remove(fname)
 
 
+_which_exts = ("", ".exe", ".bat") if sys.platform == "win32" else ("",)
+_which_cache = {}
+
+
 def which(cmd):
-    """look for an executable in the current PATH environment variable"""
+    """look for an executable in the current PATH environment variable.
+    The results (including failed lookups) are cached for each PATH value."""
+    env_path = os.environ["PATH"]
+    key = (cmd, env_path, os.getcwd())
+    if key in _which_cache:
+        return _which_cache[key]
+    result = _which_impl(cmd, env_path)
+    _which_cache[key] = result
+    return result
+
+
+def _which_impl(cmd, env_path):
     if exists_and_exec(cmd):
         return cmd
-    exts = ("", ".exe", ".bat") if sys.platform == "win32" else [""]
-    for path in os.environ["PATH"].split(os.pathsep):
-        for e in exts:
-            j = os.path.join(path, cmd + e)
+    if len(_which_exts) == 1:
+        # a single candidate for each dir, so just probe it
+        for path in env_path.split(os.pathsep):
+            j = os.path.join(path, cmd)
             if exists_and_exec(j):
                 return j
+        return None
+    # several candidates for each dir: instead of probing each of them,
+    # look them up in the (cached) listing of the dir
+    wanted = [(cmd + e).lower() for e in _which_exts]
+    for path in env_path.split(os.pathsep):
+        entries = _dir_entries(path)
+        for n in wanted:
+            if n in entries:
+                j = os.path.join(path, n)
+                if exists_and_exec(j):
+                    return j
     return None
 
 
+_dir_entries_cache = {}
+
+
+def _dir_entries(path):
+    """get the lowercase names of the entries in a dir. Used by which()
+    when probing several extensions, so the listing is cached."""
+    entries = _dir_entries_cache.get(path)
+    if entries is None:
+        try:
+            with os.scandir(path) as it:
+                entries = frozenset(e.name.lower() for e in it)
+        except OSError:
+            entries = frozenset()
+        _dir_entries_cache[path] = entries
+    return entries
+
+
 def exists_and_exec(file):
     """return true if the given file exists and is executable"""
-    if not os.path.exists(file):
-        return False
-    if not os.access(file, os.R_OK):
-        return False
-    if not os.access(file, os.X_OK):
-        return False
-    return True
+    # a single access() call: it fails when the file does not exist
+    return os.access(file, os.R_OK | os.X_OK)
+
+
+_cacheattr_missing = object()
 
 
 def cacheattr(obj, name, function):
     """add and cache an object member which is the result of a given function.
-    This is for implementing lazy getters when the function call is expensive."""
-    if hasattr(obj, name):
-        val = getattr(obj, name)
-    else:
+    This is for implementing lazy getters when the function call is expensive.
+    Only the object's own members are looked at (not those of its class or
+    bases), with a single lookup in its __dict__."""
+    val = obj.__dict__.get(name, _cacheattr_missing)
+    if val is _cacheattr_missing:
         val = function()
         setattr(obj, name, val)
     return val
@@ -474,16 +514,23 @@ class setcwd:
             return
         if not self.silent:
             print("Entering directory", self.dir, "(was in {})".format(self.old))
-        chkf(self.dir)
-        os.chdir(self.dir)
+        _chdir(self.dir)
 
     def __exit__(self, exc_type, exc_value, traceback):
         if self.old == self.dir:
             return
         if not self.silent:
             print("Returning to directory", self.old, "(currently in {})".format(self.dir))
-        chkf(self.old)
-        os.chdir(self.old)
+        _chdir(self.old)
+
+
+def _chdir(dir_):
+    """like chkf(dir_) followed by os.chdir(dir_), but without
+    stat()ing the directory first"""
+    try:
+        os.chdir(dir_)
+    except FileNotFoundError:
+        raise Exception("path does not exist: " + dir_ + ". Current dir=" + os.getcwd())  # nopep8
 
 
 # -----------------------------------------------------------------------------
@@ -491,6 +538,9 @@ class setcwd:
 def time_since_modification(path):
     """return the time elapsed since a path has been last modified, as a
     dateutil.relativedelta"""
+    # these are needed only here, so import them only when used
+    import datetime
+    from dateutil.relativedelta import relativedelta
     mtime = os.path.getmtime(path)
     mtime = datetime.datetime.fromtimestamp(mtime)
     currt = datetime.datetime.now()
@@ -556,47 +606,37 @@ else:
     sprun = subprocess_run_impl
 
 
-def runsyscmd(cmd, echo_cmd=True, echo_output=True, capture_output=False, as_bytes_string=False):
+def _cmd_banner(cmd):
+    """join the command arguments into a single string for echoing,
+    quoted the way the platform's shell would need them. This is only
+    for showing: the command itself is always run as a list."""
+    if in_windows():
+        return subprocess.list2cmdline(cmd)
+    return " ".join(shlex.quote(a) for a in cmd)  # shlex.join() needs 3.8
+
+
+def runsyscmd(cmd, echo_cmd=True, echo_output=True, capture_output=False, as_bytes_string=False, cwd=None):
     """DEPRECATED: use runcmd() instead.
-    run a system command. Note that stderr is interspersed with stdout"""
+    run a system command. Note that stderr is interspersed with stdout.
+    If cwd is given, the command is run there without changing the
+    current directory of this process."""
     if not isinstance(cmd, list):
         raise Exception("the command must be a list with each argument a different element in the list")
     if echo_cmd:
-        scmd = cmd
-        if not isinstance(cmd, str):
-            scmd = ""
-            for a in cmd:
-                if ' ' in a:
-                    if in_windows():
-                        a = '"' + a + '"'
-                    else:
-                        a = re.sub(r' ', r'\\ ', a)
-                scmd += " " + a
-        logcmd(f'$ cd {os.path.realpath(os.getcwd())} &&{scmd}')
-    if as_bytes_string:
-        if capture_output:
-            result = sprun(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDERR)
-            result.check_returncode()
-            return result.stdout
-        else:
-            result = sprun(cmd)
-            result.check_returncode()
+        logcmd(f'$ cd {os.path.realpath(cwd or os.getcwd())} && {_cmd_banner(cmd)}')
+    # the command is passed as an argument list, so no shell is spawned.
+    if capture_output:
+        # get the whole output in one go, instead of reading it line by line
+        result = sprun(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                       universal_newlines=not as_bytes_string, cwd=cwd)
+        result.check_returncode()
+        return result.stdout if as_bytes_string else str(result.stdout)
+    if echo_output or as_bytes_string:
+        result = sprun(cmd, cwd=cwd)
     else:
-        if not echo_output:
-            result = sprun(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                           universal_newlines=True)
-            result.check_returncode()
-            if capture_output:
-                return str(result.stdout)
-        elif echo_output:
-            if capture_output:
-                result = sprun(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                               universal_newlines=True)
-                result.check_returncode()
-                return str(result.stdout)
-            else:
-                result = sprun(cmd, universal_newlines=True)
-                result.check_returncode()
+        # the output is not wanted, so do not buffer it
+        result = sprun(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=cwd)
+    result.check_returncode()
 
 
 def runcmd_nocheck(cmd, *cmd_args, **run_args):
@@ -2,8 +2,6 @@
 
 import os
 import re
-import glob
-import json
 import sys
 
 from collections import OrderedDict as odict
@@ -25,7 +23,7 @@ class VisualStudioInfo:
         self.name_without_toolset = cn
         self.toolset = toolset
         self.ver = ver
-        self.year = int(re.sub(r'^vs(....).*', r'\1', name))
+        self.year = int(_year_rx.match(name).group(1))
         self.gen = to_gen(cn)
         self.architecture = parse_architecture(self.gen)
         self.dir = vsdir(ver)
@@ -36,7 +34,7 @@ class VisualStudioInfo:
         self.cxx_compiler = cxx_compiler(ver)
         self.c_compiler = c_compiler(ver)
         if self.toolset is not None:
-            self.is_clang = re.search(r'clang', self.toolset) is not None
+            self.is_clang = 'clang' in self.toolset
         else:
             self.is_clang = False
     def runsyscmd(self, cmd, **kwargs):
@@ -82,106 +80,124 @@ def find_any():
 # -----------------------------------------------------------------------------
 # -----------------------------------------------------------------------------
 # -----------------------------------------------------------------------------
-# a reversible dictionary for the VS version numbers
-_versions = {
-    'vs2019':16, 16:'vs2019', 'vs2019_64':16, 'vs2019_32':16, 'vs2019_arm':16 , 'vs2019_arm32':16, 'vs2019_arm64':16, # nopep8
-    'vs2017':15, 15:'vs2017', 'vs2017_64':15, 'vs2017_32':15, 'vs2017_arm':15 ,  # nopep8
-    'vs2015':14, 14:'vs2015', 'vs2015_64':14, 'vs2015_32':14, 'vs2015_arm':14 ,  # nopep8
-    'vs2013':12, 12:'vs2013', 'vs2013_64':12, 'vs2013_32':12, 'vs2013_arm':12 ,  # nopep8
-    'vs2012':11, 11:'vs2012', 'vs2012_64':11, 'vs2012_32':11, 'vs2012_arm':11 ,  # nopep8
-    'vs2010':10, 10:'vs2010', 'vs2010_64':10, 'vs2010_32':10, 'vs2010_ia64':10,  # nopep8
-    'vs2008':9 , 9 :'vs2008', 'vs2008_64':9 , 'vs2008_32':9 , 'vs2008_ia64':9 ,  # nopep8
-    'vs2005':8 , 8 :'vs2005', 'vs2005_64':8 , 'vs2005_32':8 ,   # nopep8
-}
+# (alias, version, generator name, arch suffixes) for each VS version
+_specs = (
+    ('vs2019', 16, 'Visual Studio 16 2019', ('_64', '_32', '_arm', '_arm32', '_arm64')),
+    ('vs2017', 15, 'Visual Studio 15 2017', ('_64', '_32', '_arm')),
+    ('vs2015', 14, 'Visual Studio 14 2015', ('_64', '_32', '_arm')),
+    ('vs2013', 12, 'Visual Studio 12 2013', ('_64', '_32', '_arm')),
+    ('vs2012', 11, 'Visual Studio 11 2012', ('_64', '_32', '_arm')),
+    ('vs2010', 10, 'Visual Studio 10 2010', ('_64', '_32', '_ia64')),
+    ('vs2008',  9, 'Visual Studio 9 2008' , ('_64', '_32', '_ia64')),
+    ('vs2005',  8, 'Visual Studio 8 2005' , ('_64', '_32')),
+)
+
+
+def _make_versions():
+    """a reversible dictionary for the VS version numbers"""
+    d = {}
+    for alias, ver, _, sfxs in _specs:
+        d[alias] = ver
+        d[ver] = alias
+        for sfx in sfxs:
+            d[alias + sfx] = ver
+    return d
+
+
+_versions = _make_versions()
 
 
 # -----------------------------------------------------------------------------
 # -----------------------------------------------------------------------------
 # -----------------------------------------------------------------------------
-if util.in_64bit():
-    _sfx = ' Win64'  # suffix
-    _arc = 'x64'  # suffix for vs2019
-    _arc2 = 'x86_64'
-else:
-    _sfx = ''  # suffix
-    _arc = 'Win32'  # suffix for vs2019
-    _arc2 = 'x86'
-
-# a reversible dictionary for the names
-_names = {
-    'vs2019'      : ['Visual Studio 16 2019', '-A', _arc   ], 'Visual Studio 16 2019' + _arc : 'vs2019'      ,  # nopep8
-    'vs2019_32'   : ['Visual Studio 16 2019', '-A', 'Win32'], 'Visual Studio 16 2019'        : 'vs2019_32'   ,  # nopep8
-    'vs2019_64'   : ['Visual Studio 16 2019', '-A', 'x64'  ], 'Visual Studio 16 2019 Win64'  : 'vs2019_64'   ,  # nopep8
-    'vs2019_arm'  : ['Visual Studio 16 2019', '-A', 'ARM'  ], 'Visual Studio 16 2019 ARM'    : 'vs2019_arm'  ,  # nopep8
-    'vs2019_arm32': ['Visual Studio 16 2019', '-A', 'ARM'  ], 'Visual Studio 16 2019 ARM32'  : 'vs2019_arm32',  # nopep8
-    'vs2019_arm64': ['Visual Studio 16 2019', '-A', 'ARM64'], 'Visual Studio 16 2019 ARM64'  : 'vs2019_arm64',  # nopep8
-    'vs2017'      : 'Visual Studio 15 2017' + _sfx          , 'Visual Studio 15 2017' + _sfx : 'vs2017'      ,  # nopep8
-    'vs2017_32'   : 'Visual Studio 15 2017'                 , 'Visual Studio 15 2017'        : 'vs2017_32'   ,  # nopep8
-    'vs2017_64'   : 'Visual Studio 15 2017 Win64'           , 'Visual Studio 15 2017 Win64'  : 'vs2017_64'   ,  # nopep8
-    'vs2017_arm'  : 'Visual Studio 15 2017 ARM'             , 'Visual Studio 15 2017 ARM'    : 'vs2017_arm'  ,  # nopep8
-    'vs2015'      : 'Visual Studio 14 2015' + _sfx          , 'Visual Studio 14 2015' + _sfx : 'vs2015'      ,  # nopep8
-    'vs2015_32'   : 'Visual Studio 14 2015'                 , 'Visual Studio 14 2015'        : 'vs2015_32'   ,  # nopep8
-    'vs2015_64'   : 'Visual Studio 14 2015 Win64'           , 'Visual Studio 14 2015 Win64'  : 'vs2015_64'   ,  # nopep8
-    'vs2015_arm'  : 'Visual Studio 14 2015 ARM'             , 'Visual Studio 14 2015 ARM'    : 'vs2015_arm'  ,  # nopep8
-    'vs2013'      : 'Visual Studio 12 2013' + _sfx          , 'Visual Studio 12 2013' + _sfx : 'vs2013'      ,  # nopep8
-    'vs2013_32'   : 'Visual Studio 12 2013'                 , 'Visual Studio 12 2013'        : 'vs2013_32'   ,  # nopep8
-    'vs2013_64'   : 'Visual Studio 12 2013 Win64'           , 'Visual Studio 12 2013 Win64'  : 'vs2013_64'   ,  # nopep8
-    'vs2013_arm'  : 'Visual Studio 12 2013 ARM'             , 'Visual Studio 12 2013 ARM'    : 'vs2013_arm'  ,  # nopep8
-    'vs2012'      : 'Visual Studio 11 2012' + _sfx          , 'Visual Studio 11 2012' + _sfx : 'vs2012'      ,  # nopep8
-    'vs2012_32'   : 'Visual Studio 11 2012'                 , 'Visual Studio 11 2012'        : 'vs2012_32'   ,  # nopep8
-    'vs2012_64'   : 'Visual Studio 11 2012 Win64'           , 'Visual Studio 11 2012 Win64'  : 'vs2012_64'   ,  # nopep8
-    'vs2012_arm'  : 'Visual Studio 11 2012 ARM'             , 'Visual Studio 11 2012 ARM'    : 'vs2012_arm'  ,  # nopep8
-    'vs2010'      : 'Visual Studio 10 2010' + _sfx          , 'Visual Studio 10 2010' + _sfx : 'vs2010'      ,  # nopep8
-    'vs2010_32'   : 'Visual Studio 10 2010'                 , 'Visual Studio 10 2010'        : 'vs2010_32'   ,  # nopep8
-    'vs2010_64'   : 'Visual Studio 10 2010 Win64'           , 'Visual Studio 10 2010 Win64'  : 'vs2010_64'   ,  # nopep8
-    'vs2010_ia64' : 'Visual Studio 10 2010 IA64'            , 'Visual Studio 10 2010 IA64'   : 'vs2010_ia64' ,  # nopep8
-    'vs2008'      : 'Visual Studio 9 2008' + _sfx           , 'Visual Studio 9 2008' + _sfx  : 'vs2008'      ,  # nopep8
-    'vs2008_32'   : 'Visual Studio 9 2008'                  , 'Visual Studio 9 2008'         : 'vs2008_32'   ,  # nopep8
-    'vs2008_64'   : 'Visual Studio 9 2008 Win64'            , 'Visual Studio 9 2008 Win64'   : 'vs2008_64'   ,  # nopep8
-    'vs2008_ia64' : 'Visual Studio 9 2008 IA64'             , 'Visual Studio 9 2008 IA64'    : 'vs2008_ia64' ,  # nopep8
-    'vs2005'      : 'Visual Studio 8 2005' + _sfx           , 'Visual Studio 8 2005' + _sfx  : 'vs2005'      ,  # nopep8
-    'vs2005_32'   : 'Visual Studio 8 2005'                  , 'Visual Studio 8 2005'         : 'vs2005_32'   ,  # nopep8
-    'vs2005_64'   : 'Visual Studio 8 2005 Win64'            , 'Visual Studio 8 2005 Win64'   : 'vs2005_64'   ,  # nopep8
-}
-
-_architectures = {
-    'Visual Studio 16 2019'         : 'x86'    ,
-    'Visual Studio 16 2019 Win32'   : 'x86'    ,
-    'Visual Studio 16 2019 Win64'   : 'x86_64' ,
-    'Visual Studio 16 2019 x86'     : 'x86'    ,
-    'Visual Studio 16 2019 x64'     : 'x86_64' ,
-    'Visual Studio 16 2019 ARM'     : 'arm'    ,
-    'Visual Studio 16 2019 ARM32'   : 'arm32'  ,
-    'Visual Studio 16 2019 ARM64'   : 'arm64'  ,
-    'Visual Studio 16 2019 -A '+_arc: _arc2    ,
-    'Visual Studio 16 2019 -A Win32': 'x86'    ,
-    'Visual Studio 16 2019 -A Win64': 'x86_64' ,
-    'Visual Studio 16 2019 -A x64'  : 'x86_64' ,
-    'Visual Studio 16 2019 -A x86'  : 'x86'    ,
-    'Visual Studio 16 2019 -A ARM'  : 'arm'    ,
-    'Visual Studio 16 2019 -A ARM32': 'arm'    ,
-    'Visual Studio 16 2019 -A ARM64': 'arm64'  ,
-    'Visual Studio 15 2017'         : 'x86'    ,
-    'Visual Studio 15 2017 Win64'   : 'x86_64' ,
-    'Visual Studio 15 2017 ARM'     : 'arm'    ,
-    'Visual Studio 14 2015'         : 'x86'    ,
-    'Visual Studio 14 2015 Win64'   : 'x86_64' ,
-    'Visual Studio 14 2015 ARM'     : 'arm'    ,
-    'Visual Studio 12 2013'         : 'x86'    ,
-    'Visual Studio 12 2013 Win64'   : 'x86_64' ,
-    'Visual Studio 12 2013 ARM'     : 'arm'    ,
-    'Visual Studio 11 2012'         : 'x86'    ,
-    'Visual Studio 11 2012 Win64'   : '_64'    ,
-    'Visual Studio 11 2012 ARM'     : 'arm'    ,
-    'Visual Studio 10 2010'         : 'x86'    ,
-    'Visual Studio 10 2010 Win64'   : 'x86_64' ,
-    'Visual Studio 10 2010 IA64'    : 'ia64'   ,
-    'Visual Studio 9 2008'          : 'x86'    ,
-    'Visual Studio 9 2008 Win64'    : 'x86_64' ,
-    'Visual Studio 9 2008 IA64'     : 'ia64'   ,
-    'Visual Studio 8 2005'          : 'x86'    ,
-    'Visual Studio 8 2005 Win64'    : 'x86_64' ,
-}
+def _host_suffixes():
+    """get the (name suffix, -A arg for vs2019, architecture) of the
+    default VS generators for this machine"""
+    if util.in_64bit():
+        return ' Win64', 'x64', 'x86_64'
+    return '', 'Win32', 'x86'
+
+
+# the name and architecture tables are only needed when dealing with VS,
+# so they are built on first use
+def _get_names():
+    return cacheattr(sys.modules[__name__], '_names', _make_names)
+
+
+def _get_architectures():
+    return cacheattr(sys.modules[__name__], '_architectures', _make_architectures)
+
+
+def _make_names():
+    """a reversible dictionary for the names"""
+    _sfx, _arc, _ = _host_suffixes()
+    # vs2019+ take the architecture as an argument: sfx -> (-A arg, reverse name)
+    args = {''      : (_arc   , _arc    ),  # nopep8
+            '_32'   : ('Win32', ''      ),  # nopep8
+            '_64'   : ('x64'  , ' Win64'),  # nopep8
+            '_arm'  : ('ARM'  , ' ARM'  ),  # nopep8
+            '_arm32': ('ARM'  , ' ARM32'),  # nopep8
+            '_arm64': ('ARM64', ' ARM64')}  # nopep8
+    # older versions have the architecture in the name: sfx -> name suffix
+    names = {''     : _sfx    ,  # nopep8
+             '_32'  : ''      ,  # nopep8
+             '_64'  : ' Win64',  # nopep8
+             '_arm' : ' ARM'  ,  # nopep8
+             '_ia64': ' IA64' }  # nopep8
+    d = {}
+    for alias, ver, gen, sfxs in _specs:
+        for sfx in ('',) + sfxs:
+            if ver >= 16:
+                a, r = args[sfx]
+                d[alias + sfx] = [gen, '-A', a]
+                d[gen + r] = alias + sfx
+            else:
+                g = gen + names[sfx]
+                d[alias + sfx] = g
+                d[g] = alias + sfx
+    return d
+
+
+def _make_architectures():
+    _, _arc, _arc2 = _host_suffixes()
+    return {
+        'Visual Studio 16 2019'         : 'x86'    ,
+        'Visual Studio 16 2019 Win32'   : 'x86'    ,
+        'Visual Studio 16 2019 Win64'   : 'x86_64' ,
+        'Visual Studio 16 2019 x86'     : 'x86'    ,
+        'Visual Studio 16 2019 x64'     : 'x86_64' ,
+        'Visual Studio 16 2019 ARM'     : 'arm'    ,
+        'Visual Studio 16 2019 ARM32'   : 'arm32'  ,
+        'Visual Studio 16 2019 ARM64'   : 'arm64'  ,
+        'Visual Studio 16 2019 -A '+_arc: _arc2    ,
+        'Visual Studio 16 2019 -A Win32': 'x86'    ,
+        'Visual Studio 16 2019 -A Win64': 'x86_64' ,
+        'Visual Studio 16 2019 -A x64'  : 'x86_64' ,
+        'Visual Studio 16 2019 -A x86'  : 'x86'    ,
+        'Visual Studio 16 2019 -A ARM'  : 'arm'    ,
+        'Visual Studio 16 2019 -A ARM32': 'arm'    ,
+        'Visual Studio 16 2019 -A ARM64': 'arm64'  ,
+        'Visual Studio 15 2017'         : 'x86'    ,
+        'Visual Studio 15 2017 Win64'   : 'x86_64' ,
+        'Visual Studio 15 2017 ARM'     : 'arm'    ,
+        'Visual Studio 14 2015'         : 'x86'    ,
+        'Visual Studio 14 2015 Win64'   : 'x86_64' ,
+        'Visual Studio 14 2015 ARM'     : 'arm'    ,
+        'Visual Studio 12 2013'         : 'x86'    ,
+        'Visual Studio 12 2013 Win64'   : 'x86_64' ,
+        'Visual Studio 12 2013 ARM'     : 'arm'    ,
+        'Visual Studio 11 2012'         : 'x86'    ,
+        'Visual Studio 11 2012 Win64'   : '_64'    ,
+        'Visual Studio 11 2012 ARM'     : 'arm'    ,
+        'Visual Studio 10 2010'         : 'x86'    ,
+        'Visual Studio 10 2010 Win64'   : 'x86_64' ,
+        'Visual Studio 10 2010 IA64'    : 'ia64'   ,
+        'Visual Studio 9 2008'          : 'x86'    ,
+        'Visual Studio 9 2008 Win64'    : 'x86_64' ,
+        'Visual Studio 9 2008 IA64'     : 'ia64'   ,
+        'Visual Studio 8 2005'          : 'x86'    ,
+        'Visual Studio 8 2005 Win64'    : 'x86_64' ,
+    }
 
 
 # -----------------------------------------------------------------------------
@@ -193,7 +209,7 @@ def to_name(name_or_gen_or_ver):
     else:
         if name_or_gen_or_ver.startswith('vs'):
             return sep_name_toolset(name_or_gen_or_ver)[0]
-        n = _names.get(name_or_gen_or_ver)
+        n = _get_names().get(name_or_gen_or_ver)
         if n is not None:
             return n
     raise Exception("could not find '{}'".format(name_or_gen_or_ver))
@@ -217,7 +233,7 @@ def to_gen(name_or_gen_or_ver):
     elif isinstance(n, list):
         return n
     n = sep_name_toolset(n)[0]
-    return _names[n]
+    return _get_names()[n]
 
 
 # -----------------------------------------------------------------------------
@@ -245,18 +261,18 @@ _toolsets = (
     'clang_c2', 'clang', 'xp',
 )
 _toolsets_for_re = sorted(_toolsets, key=lambda x: -len(x))
+# the name part is non-greedy, so that the longest toolset is matched
+_toolset_rx = re.compile(r'(vs.....*?)_({})$'.format('|'.join(_toolsets_for_re)))
+_year_rx = re.compile(r'^vs(....)')
 
 
 def sep_name_toolset(name, canonize=True):
     """separate name and toolset"""
     toolset = None
     if isinstance(name, str):
-        for t in _toolsets_for_re:
-            rx = r'vs.....*_({})$'.format(t)
-            if re.search(rx, name):
-                toolset = re.sub(rx, r'\1', name)
-                name_without_toolset = re.sub(r'(vs.....*)_({})$'.format(t), r'\1', name)
-                break
+        m = _toolset_rx.search(name)
+        if m is not None:
+            name_without_toolset, toolset = m.group(1), m.group(2)
     if toolset is None:
         return name, None
     if toolset not in _toolsets:
@@ -264,8 +280,9 @@ def sep_name_toolset(name, canonize=True):
     if not canonize:
         return name_without_toolset, toolset
     if toolset in ('clang_c2', 'clang', 'xp'):
-        assert re.match('vs....', name)
-        year = int(re.sub(r'^vs(....).*', r'\1', name))
+        m = _year_rx.match(name)
+        assert m is not None
+        year = int(m.group(1))
         if year == 2019:
             vs_toolset = 'v142_' + toolset
         elif year == 2017:
@@ -302,21 +319,35 @@ def parse_architecture(name_or_gen_or_ver):
     gen = to_gen(name_or_gen_or_ver)
     if isinstance(gen, list):
         gen = " ".join(gen)
-    a = _architectures[gen]
+    a = _get_architectures()[gen]
     return a
 
 
 # -----------------------------------------------------------------------------
 # -----------------------------------------------------------------------------
 # -----------------------------------------------------------------------------
+def _progfilesx86_entries(progfilesx86):
+    """VS versions prior to 2017 are installed by default in
+    %ProgramFiles(x86)%, so list it once for all of them instead of
+    probing a dir for each version"""
+    def fn():
+        try:
+            with os.scandir(progfilesx86) as it:
+                return frozenset(e.name.lower() for e in it if e.is_dir())
+        except OSError:
+            return frozenset()
+    return cacheattr(sys.modules[__name__], '_progfilesx86_entries_', fn)
+
+
 def vsdir(name_or_gen_or_ver):
     """get the directory where VS is installed"""
     ver = to_ver(name_or_gen_or_ver)
     d = ""
     if ver < 15:
         progfilesx86 = os.environ['ProgramFiles(x86)']
-        d = os.path.join(progfilesx86, 'Microsoft Visual Studio ' + str(ver) + '.0')
-        if not os.path.exists(d):
+        n = 'Microsoft Visual Studio ' + str(ver) + '.0'
+        d = os.path.join(progfilesx86, n)
+        if n.lower() not in _progfilesx86_entries(progfilesx86):
             try:
                 v = os.environ['VS{}0COMNTOOLS'.format(str(ver))]
                 d = os.path.abspath(os.path.join(v, '..', '..'))
@@ -349,10 +380,15 @@ def devenv(name_or_gen_or_ver):
     d = vsdir(ver)
     # devenv can have different names:
     # see http://stackoverflow.com/questions/7818543/no-devenv-file-in-microsoft-visual-express-10
+    ide = os.path.join(d, 'Common7', 'IDE')
+    try:
+        # list the dir once instead of stat()ing each candidate
+        entries = set(os.listdir(ide))
+    except OSError:
+        return None
     for n in ('devenv.exe', 'WDExpress.exe', 'VSWinExpress.exe'):
-        s = os.path.join(d, 'Common7', 'IDE', n)
-        if os.path.exists(s):
-            return s
+        if n in entries:
+            return os.path.join(ide, n)
     return None
 
 
@@ -437,13 +473,14 @@ def _is_installed_impl(ver):
         try:
             #wr.OpenKey(wr.HKEY_LOCAL_MACHINE, key.format(ver), 0, wr.KEY_READ)
             logdbg("_is_installed_impl:", ver, "--- old stile")
-            # fail if we can't find the dir
-            if not os.path.exists(vsdir(ver)):
-                logdbg("_is_installed_impl:", ver, "--- vsdir does not exist")
-                return False
-            # apparently the dir is not enough, so check also vcvarsall
+            # apparently the dir is not enough, so check vcvarsall, which
+            # lives inside the dir; the dir is only checked on failure,
+            # to find out what is missing
             if not os.path.exists(vcvarsall(ver)):
-                logdbg("_is_installed_impl:", ver, "--- vcvarsall not found")
+                if not os.path.exists(vsdir(ver)):
+                    logdbg("_is_installed_impl:", ver, "--- vsdir does not exist")
+                else:
+                    logdbg("_is_installed_impl:", ver, "--- vcvarsall not found")
                 return False
             logdbg("_is_installed_impl:", ver, "--- vcvarsall not found")
             return True
@@ -487,6 +524,7 @@ class VSInstanceData:
     def __init__(self, path):
         self.path = path
         self.name = os.path.basename(os.path.dirname(path))
+        import json
         with open(path, encoding="utf8") as json_str:
             self.data = json.load(json_str)
         self.version = self.data['catalogInfo']['buildVersion']
@@ -546,16 +584,19 @@ def _vs201x_get_instances():
         d = odict()
         progdata = os.environ['ProgramData']
         instances_dir = os.path.join(progdata, 'Microsoft', 'VisualStudio', 'Packages', '_Instances')
-        if not os.path.exists(instances_dir):
-            return d
-        pat = os.path.join(instances_dir, '*', 'state.json')
-        instances = glob.glob(pat)
-        logdbg("vs: found instances:", instances)
-        if not instances:
+        try:
+            it = os.scandir(instances_dir)
+        except FileNotFoundError:
             return d
-        for i in instances:
-            id = VSInstanceData(i)
-            d[id.name] = id
-            logdbg("vs: instance:", id, i)
+        with it:
+            for entry in it:
+                i = os.path.join(entry.path, 'state.json')
+                try:
+                    id = VSInstanceData(i)
+                except FileNotFoundError:
+                    continue
+                d[id.name] = id
+                logdbg("vs: instance:", id, i)
+        logdbg("vs: found instances:", list(d.keys()))
         return d
     return cacheattr(sys.modules[__name__], "_vs201x_instances", fn)
@@ -327,6 +327,63 @@ class Test10runsyscmd(ut.TestCase):
         invoke_and_compare(self, ['"arg1 and more"', '"arg2 and more"'])
 
 
+# -----------------------------------------------------------------------------
+class Test11which(ut.TestCase):
+
+    def test00_follows_path_changes(self):
+        import os
+        import tempfile
+        with tempfile.TemporaryDirectory() as d:
+            exe = os.path.join(d, 'cmany_which_test')
+            with open(exe, 'w') as f:
+                f.write("#!/bin/sh\n")
+            util.set_executable(exe)
+            old_path = os.environ["PATH"]
+            try:
+                self.assertIsNone(util.which('cmany_which_test'))
+                os.environ["PATH"] = d + os.pathsep + old_path
+                self.assertEqual(util.which('cmany_which_test'), exe)
+                self.assertEqual(util.which('cmany_which_test'), exe)
+                os.environ["PATH"] = old_path
+                self.assertIsNone(util.which('cmany_which_test'))
+            finally:
+                os.environ["PATH"] = old_path
+
+    def test01_several_exts(self):
+        import os
+        import tempfile
+        with tempfile.TemporaryDirectory() as d:
+            exe = os.path.join(d, 'cmany_which_test.bat')
+            with open(exe, 'w') as f:
+                f.write("#!/bin/sh\n")
+            util.set_executable(exe)
+            old_path, old_exts = os.environ["PATH"], util._which_exts
+            try:
+                util._which_exts = ('', '.exe', '.bat')
+                os.environ["PATH"] = d + os.pathsep + old_path
+                self.assertEqual(util.which('cmany_which_test'), exe)
+                self.assertIsNone(util.which('cmany_which_test_nope'))
+            finally:
+                os.environ["PATH"], util._which_exts = old_path, old_exts
+
+
+class Test12cacheattr(ut.TestCase):
+
+    def test00_calls_once(self):
+        class Foo:
+            pass
+        calls = []
+        def fn():
+            calls.append(1)
+            return len(calls)
+        for obj in (Foo, Foo(), sys.modules[__name__]):
+            del calls[:]
+            self.assertEqual(util.cacheattr(obj, '_cacheattr_test', fn), 1)
+            self.assertEqual(util.cacheattr(obj, '_cacheattr_test', fn), 1)
+            self.assertEqual(len(calls), 1)
+        delattr(sys.modules[__name__], '_cacheattr_test')
+
+
 # -----------------------------------------------------------------------------
 # -----------------------------------------------------------------------------
 # -----------------------------------------------------------------------------
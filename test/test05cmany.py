@@ -8,6 +8,7 @@ import glob
 import argparse
 import copy
 import tempfile
+import subprocess
 from itertools import combinations
 
 import c4.cmany as cmany
@@ -484,6 +485,82 @@ class Test03Install(ut.TestCase):
 class Test04Dependencies(ut.TestCase):
     pass
 
+
+# -----------------------------------------------------------------------------
+# -----------------------------------------------------------------------------
+# -----------------------------------------------------------------------------
+class Test05Reconfigure(ut.TestCase):
+
+    def test00_unchanged_configure_is_skipped(self):
+        skipped = "nothing changed since the last configure"
+        proj = CMakeTestProj('hello')
+        with tempfile.TemporaryDirectory() as tmp:
+            args = ['c', '-V', 'FOO_VAR=1',
+                    '--build-dir', os.path.join(tmp, 'build'),
+                    '--install-dir', os.path.join(tmp, 'install'),
+                    proj.root]
+            def run():
+                return util.runsyscmd(maincmd + args, echo_cmd=False, echo_output=False,
+                                      capture_output=True, cwd=proj.root)
+            out = run()
+            self.assertNotIn(skipped, out)
+            pfiles = glob.glob(os.path.join(tmp, 'build', '*', 'cmany_preload.cmake'))
+            self.assertEqual(len(pfiles), 1)
+            mtime = os.path.getmtime(pfiles[0])
+            # the cache now exists; this must not change anything
+            out = run()
+            self.assertIn(skipped, out)
+            self.assertEqual(os.path.getmtime(pfiles[0]), mtime)
+
+    def test01_forked_failure_is_reported(self):
+        proj = CMakeTestProj('hello')
+        with tempfile.TemporaryDirectory() as tmp:
+            dirs = ['--build-dir', os.path.join(tmp, 'build'),
+                    '--install-dir', os.path.join(tmp, 'install'),
+                    proj.root]
+            def run(*args):
+                # a hung pool must fail the test instead of the suite
+                return subprocess.run(maincmd + list(args) + dirs, cwd=proj.root,
+                                      stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                      universal_newlines=True, timeout=120).stdout
+            run('c', '-t', 'Debug,Release', '--outer-jobs', '1')
+            caches = glob.glob(os.path.join(tmp, 'build', '*', 'CMakeCache.txt'))
+            self.assertEqual(len(caches), 2)
+            os.remove(caches[0])
+            # this does not raise a BuildError, and its exception type
+            # cannot be sent back from the forked process
+            out = run('rc', '--outer-jobs', '2')
+            self.assertIn("CacheFileNotFound", out)
+            self.assertIn(caches[0], out)
+
+
+# -----------------------------------------------------------------------------
+# -----------------------------------------------------------------------------
+# -----------------------------------------------------------------------------
+class Test06Select(ut.TestCase):
+
+    def test00_restrict_to(self):
+        proj = CMakeTestProj('hello')
+        with tempfile.TemporaryDirectory() as tmp:
+            parser = argparse.ArgumentParser()
+            main.selectcmd().add_args(parser)
+            args = parser.parse_args([
+                '-t', 'Debug,Release',
+                '--build-dir', os.path.join(tmp, 'build'),
+                '--install-dir', os.path.join(tmp, 'install'),
+                proj.root])
+            p = cmany.Project(**vars(args))
+            self.assertEqual(len(p.builds), 2)
+            self.assertEqual(p.select(), p.builds)
+            b = p.builds[1]
+            sel = p.select(sys=b.system, compiler=b.compiler, build_type=b.build_type)
+            self.assertEqual(sel, [b])
+            sel = p.select(sys=str(b.system), compiler=str(b.compiler))
+            self.assertEqual(sel, p.builds)
+            self.assertEqual(p.select(build_type='MinSizeRel'), [])
+            self.assertEqual(p.select(sys='nosys'), [])
+
+
 # -----------------------------------------------------------------------------
 # -----------------------------------------------------------------------------
 # -----------------------------------------------------------------------------
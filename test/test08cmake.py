@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import unittest as ut
+import subtest_fix
+import os
+import tempfile
+
+import c4.cmany.cmake as cmake
+
+
+# the start of a cache file, as written by cmake
+cache_header = """# This is the CMakeCache file.
+# For build in directory: /tmp/foo/build
+# It was generated by CMake: /usr/bin/cmake
+# The syntax for the file is as follows:
+# KEY:TYPE=VALUE
+# KEY is the name of a variable in the cache.
+# TYPE is a hint to GUIs for the type of VALUE, DO NOT EDIT TYPE!.
+# VALUE is the current value for the KEY.
+
+########################
+# EXTERNAL cache entries
+########################
+
+"""
+
+cache_entries = r"""//Flags used by the CXX compiler during all build types.
+CMAKE_CXX_FLAGS:STRING='  '
+//Path to a program.
+CMAKE_MAKE_PROGRAM:FILEPATH=/usr/bin/make
+//No help, variable specified on the command line.
+FOO_DIR:PATH=C:\foo\bar
+SPACED:STRING=' a b '
+LEADING:STRING= a b
+
+########################
+# INTERNAL cache entries
+########################
+
+//ADVANCED property for variable: CMAKE_CXX_FLAGS
+CMAKE_CXX_FLAGS-ADVANCED:INTERNAL=1
+"""
+
+
+# -----------------------------------------------------------------------------
+# -----------------------------------------------------------------------------
+# -----------------------------------------------------------------------------
+class Test00CMakeCache(ut.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.builddir = self.tmp.name
+        self.cachefile = os.path.join(self.builddir, 'CMakeCache.txt')
+        with open(self.cachefile, 'w') as f:
+            f.write(cache_header + cache_entries)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def contents(self):
+        with open(self.cachefile) as f:
+            return f.read()
+
+    def test00_load(self):
+        c = cmake.CMakeCache(self.builddir)
+        self.assertEqual(sorted(c.keys()), [
+            'CMAKE_CXX_FLAGS', 'CMAKE_CXX_FLAGS-ADVANCED', 'CMAKE_MAKE_PROGRAM',
+            'FOO_DIR', 'LEADING', 'SPACED'])
+        self.assertEqual(c['CMAKE_CXX_FLAGS'].val, '  ')
+        self.assertEqual(c['CMAKE_CXX_FLAGS'].vartype, 'STRING')
+        self.assertEqual(c['CMAKE_MAKE_PROGRAM'].val, '/usr/bin/make')
+        self.assertEqual(c['CMAKE_MAKE_PROGRAM'].vartype, 'FILEPATH')
+        self.assertEqual(c['FOO_DIR'].val, 'C:\\foo\\bar')
+        self.assertEqual(c['SPACED'].val, ' a b ')
+        self.assertEqual(c['LEADING'].val, ' a b')
+        self.assertEqual(c['CMAKE_CXX_FLAGS-ADVANCED'].val, '1')
+
+    def test01_getcachevars(self):
+        v = cmake.getcachevars(self.builddir, ['CMAKE_CXX_FLAGS', 'FOO_DIR', 'KEY'])
+        self.assertEqual(v, {'CMAKE_CXX_FLAGS': '  ', 'FOO_DIR': 'C:\\foo\\bar'})
+
+    def test02_nothing_changed(self):
+        mtime = os.path.getmtime(self.cachefile)
+        cf = cmake.CMakeCacheFile(self.builddir)
+        self.assertFalse(cf.apply({'CMAKE_CXX_FLAGS': '  ', 'FOO_DIR': 'C:\\foo\\bar',
+                                   'SPACED': ' a b ', 'NOT_THERE': 'x'}))
+        self.assertFalse(cf.flush())
+        self.assertEqual(os.path.getmtime(self.cachefile), mtime)
+        self.assertEqual(self.contents(), cache_header + cache_entries)
+
+    def test03_roundtrip(self):
+        values = {
+            'CMAKE_CXX_FLAGS': ' ',
+            'CMAKE_MAKE_PROGRAM': '/usr/bin/gmake',
+            'FOO_DIR': 'D:\\baz\\1\\g<0>',
+            'SPACED': 'x\t',
+            'LEADING': '  ',
+            # the header line must not be taken for a var
+            'KEY': 'VAL',
+        }
+        cmake.setcachevars(self.builddir, values)
+        out = self.contents()
+        # the comments and the other vars are untouched
+        self.assertTrue(out.startswith(cache_header))
+        self.assertIn("\n# KEY:TYPE=VALUE\n", out)
+        self.assertIn("\nCMAKE_CXX_FLAGS-ADVANCED:INTERNAL=1\n", out)
+        self.assertIn("\nCMAKE_CXX_FLAGS:STRING=' '\n", out)
+        self.assertIn("\nFOO_DIR:PATH=D:\\baz\\1\\g<0>\n", out)
+        self.assertIn("\nSPACED:STRING='x\t'\n", out)
+        self.assertEqual(len(out.splitlines()), len((cache_header + cache_entries).splitlines()))
+        del values['KEY']
+        c = cmake.CMakeCache(self.builddir)
+        for k, v in values.items():
+            self.assertEqual(c[k].val, v, k)
+
+    def test04_commit(self):
+        c = cmake.CMakeCache(self.builddir)
+        self.assertFalse(c.commit(self.builddir))
+        self.assertTrue(c.setvar('FOO_DIR', 'E:\\other'))
+        self.assertFalse(c.s('CMAKE_CXX_FLAGS', '  '))
+        self.assertTrue(c.dirty)
+        self.assertTrue(c.commit(self.builddir))
+        self.assertFalse(c.dirty)
+        c = cmake.CMakeCache(self.builddir)
+        self.assertEqual(c['FOO_DIR'].val, 'E:\\other')
+        self.assertEqual(c['CMAKE_CXX_FLAGS'].val, '  ')
+
+
+# -----------------------------------------------------------------------------
+# -----------------------------------------------------------------------------
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    ut.main()